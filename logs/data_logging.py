@@ -1,17 +1,94 @@
 import os
+import sys
 import json
+import sqlite3
 import hashlib
+import gzip
 import logging
+from contextlib import contextmanager
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.shared_files import file_lock
+
+# -------------------------
+# Storage
+# -------------------------
+# RFP logs live in SQLite (WAL mode, so readers never block the writer):
+#   rfps          one row per RFP (metadata, created_at, last_updated)
+#   tool_results  latest result per (rfp_id, tool), pointing at a blob
+#                 (raw=1: the blob is the whole tool entry, for legacy entries
+#                 that are not {"timestamp", "result"})
+#   blobs         result JSON keyed by its sha256, shared by identical results
+#   payloads      strings of LOG_PAYLOAD_MIN_BYTES or more (PDF raw_text,
+#                 quotation / proposal HTML), gzip-compressed and keyed by the
+#                 sha256 of the text; a result blob holds {"$payload": hash}
+#                 in their place, so the same HTML logged twice is stored once
+#   blob_payloads which payloads each result blob refers to
+# Payloads are only read and decompressed for the tools a read asks for
+# (get_rfp_data(rfp_id, tools=[...])).
+# A log_* call writes one RFP's row and one tool result instead of rewriting
+# the whole history. An existing rfp_logs.json is imported on first use.
+#
+# Every tool runs in its own process, so writes must not interleave:
+#   - each write is one BEGIN IMMEDIATE transaction (the write lock is taken
+#     before anything is read, so a read-modify-write cannot go stale)
+#   - update_tool(rfp_id, tool, fn) changes a stored result in place
+#   - lock(rfp_id) serializes longer edits of one RFP across processes
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rfps (
+    rfp_id TEXT PRIMARY KEY,
+    document_name TEXT,
+    rfp_number TEXT,
+    issue_date TEXT,
+    client_name TEXT,
+    created_at TEXT,
+    last_updated TEXT
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS tool_results (
+    rfp_id TEXT NOT NULL REFERENCES rfps (rfp_id),
+    tool TEXT NOT NULL,
+    timestamp TEXT,
+    result_hash TEXT NOT NULL REFERENCES blobs (hash),
+    raw INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (rfp_id, tool)
+);
+CREATE TABLE IF NOT EXISTS payloads (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    data BLOB NOT NULL
+);
+CREATE TABLE IF NOT EXISTS blob_payloads (
+    blob_hash TEXT NOT NULL,
+    payload_hash TEXT NOT NULL,
+    PRIMARY KEY (blob_hash, payload_hash)
+);
+CREATE INDEX IF NOT EXISTS idx_blob_payloads_payload ON blob_payloads (payload_hash);
+CREATE INDEX IF NOT EXISTS idx_tool_results_tool ON tool_results (tool);
+CREATE INDEX IF NOT EXISTS idx_rfps_last_updated ON rfps (last_updated);
+"""
+
+LOG_PAYLOAD_MIN_BYTES = int(os.getenv("LOG_PAYLOAD_MIN_BYTES", "4096"))
+PAYLOAD_REF = "$payload"
+RFP_FIELDS = ("document_name", "rfp_number", "issue_date", "client_name", "created_at", "last_updated")
+
+
 class data_logger:
     """
-    Centralized JSON-based logger for RFP pipeline.
+    Centralized SQLite-backed logger for RFP pipeline.
     Each RFP is identified by a stable document ID derived from metadata.
     """
 
-    def __init__(self, log_filename: str = "rfp_logs.json", app_log: str = "rfp_app.log"):
+    def __init__(self, log_filename: str = "rfp_logs.db", app_log: str = "rfp_app.log",
+                 legacy_filename: str = "rfp_logs.json"):
         self.LOG_FILE = os.path.join(os.path.dirname(__file__), log_filename)
+        self.LEGACY_LOG_FILE = os.path.join(os.path.dirname(__file__), legacy_filename)
+        self.LOCK_DIR = os.path.join(os.path.dirname(self.LOG_FILE), "locks")
         log_path = os.path.join(os.path.dirname(__file__), app_log)
 
         # Get a dedicated logger for RFP pipeline
@@ -30,108 +107,338 @@ class data_logger:
             self.logger.addHandler(file_handler)
             self.logger.addHandler(stream_handler)
 
+        with self._connect(write=True) as conn:
+            for statement in SCHEMA.split(";"):
+                if statement.strip():
+                    conn.execute(statement)
+        self._import_legacy()
+
     # ------------------------
     # Helpers
     # ------------------------
-    def _load_logs(self) -> dict:
-        if not os.path.exists(self.LOG_FILE):
-            return {}
+    @contextmanager
+    def _connect(self, write=False):
+        """One transaction: commit on success, roll back on error."""
+        conn = sqlite3.connect(self.LOG_FILE, timeout=30, isolation_level=None)
         try:
-            with open(self.LOG_FILE, "r") as f:
-                return json.load(f)
-        except json.JSONDecodeError:
-            self.logger.error(f"Corrupted log file {self.LOG_FILE}. Resetting.")
-            return {}
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            conn.execute("BEGIN IMMEDIATE" if write else "BEGIN")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    @contextmanager
+    def lock(self, rfp_id: str):
+        """Exclusive lock on one RFP, shared by every process using this log."""
+        with file_lock(os.path.join(self.LOCK_DIR, f"{rfp_id}.lock")):
+            yield
+
+    def _import_legacy(self):
+        """Import rfp_logs.json into the database once, when the database is still empty."""
+        if not os.path.exists(self.LEGACY_LOG_FILE):
+            return
+        with self._connect(write=True) as conn:
+            if conn.execute("SELECT 1 FROM rfps LIMIT 1").fetchone():
+                return
+            try:
+                with open(self.LEGACY_LOG_FILE, "r") as f:
+                    logs = json.load(f)
+            except json.JSONDecodeError:
+                self.logger.error(f"Corrupted log file {self.LEGACY_LOG_FILE}. Not imported.")
+                return
+            self._save_logs(logs, conn)
+        self.logger.info(f"Imported {len(logs)} RFP logs from {self.LEGACY_LOG_FILE}")
 
-    def _save_logs(self, logs: dict):
-        with open(self.LOG_FILE, "w") as f:
-            json.dump(logs, f, indent=4)
+    def _externalize(self, conn, value, refs: set):
+        """`value` with every large string stored as a payload and replaced by a reference."""
+        if isinstance(value, dict):
+            return {k: self._externalize(conn, v, refs) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._externalize(conn, v, refs) for v in value]
+        if isinstance(value, str) and len(value) >= LOG_PAYLOAD_MIN_BYTES:
+            text = value.encode("utf-8")
+            digest = hashlib.sha256(text).hexdigest()
+            if digest not in refs:
+                conn.execute(
+                    "INSERT OR IGNORE INTO payloads (hash, size, data) VALUES (?, ?, ?)",
+                    (digest, len(text), gzip.compress(text, mtime=0)),
+                )
+                refs.add(digest)
+            return {PAYLOAD_REF: digest}
+        return value
+
+    def _resolve(self, conn, values: list) -> list:
+        """Replace the payload references in `values` by their text (one query for all of them)."""
+        refs = set()
+
+        def collect(value):
+            if isinstance(value, dict):
+                if len(value) == 1 and PAYLOAD_REF in value:
+                    refs.add(value[PAYLOAD_REF])
+                else:
+                    for v in value.values():
+                        collect(v)
+            elif isinstance(value, list):
+                for v in value:
+                    collect(v)
+
+        def substitute(value):
+            if isinstance(value, dict):
+                if len(value) == 1 and PAYLOAD_REF in value:
+                    return texts[value[PAYLOAD_REF]]
+                return {k: substitute(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [substitute(v) for v in value]
+            return value
+
+        for value in values:
+            collect(value)
+        if not refs:
+            return values
+        texts = {}
+        refs = list(refs)
+        for i in range(0, len(refs), 500):
+            chunk = refs[i:i + 500]
+            for digest, data in conn.execute(
+                f"SELECT hash, data FROM payloads WHERE hash IN ({','.join('?' * len(chunk))})", chunk
+            ):
+                texts[digest] = gzip.decompress(data).decode("utf-8")
+        return [substitute(value) for value in values]
+
+    def _put_blob(self, conn, value) -> str:
+        refs = set()
+        data = json.dumps(self._externalize(conn, value, refs), sort_keys=True).encode("utf-8")
+        digest = hashlib.sha256(data).hexdigest()
+        if conn.execute("INSERT OR IGNORE INTO blobs (hash, data) VALUES (?, ?)", (digest, data)).rowcount:
+            conn.executemany(
+                "INSERT OR IGNORE INTO blob_payloads (blob_hash, payload_hash) VALUES (?, ?)",
+                [(digest, ref) for ref in refs],
+            )
+        return digest
+
+    def _drop_blob(self, conn, digest):
+        """Delete a result blob, and the payloads only it referred to, once no tool result uses it."""
+        if conn.execute("SELECT 1 FROM tool_results WHERE result_hash = ? LIMIT 1", (digest,)).fetchone():
+            return
+        conn.execute("DELETE FROM blobs WHERE hash = ?", (digest,))
+        refs = [r for (r,) in conn.execute("SELECT payload_hash FROM blob_payloads WHERE blob_hash = ?", (digest,))]
+        conn.execute("DELETE FROM blob_payloads WHERE blob_hash = ?", (digest,))
+        for ref in refs:
+            conn.execute(
+                "DELETE FROM payloads WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM blob_payloads WHERE payload_hash = ?)",
+                (ref, ref),
+            )
+
+    def _set_tool(self, conn, rfp_id, tool, timestamp, value, raw=False):
+        """Point (rfp_id, tool) at the blob of `value` and drop the blob it replaced if now unused."""
+        previous = conn.execute(
+            "SELECT result_hash FROM tool_results WHERE rfp_id = ? AND tool = ?", (rfp_id, tool)
+        ).fetchone()
+        digest = self._put_blob(conn, value)
+        conn.execute(
+            "INSERT OR REPLACE INTO tool_results (rfp_id, tool, timestamp, result_hash, raw) VALUES (?, ?, ?, ?, ?)",
+            (rfp_id, tool, timestamp, digest, int(raw)),
+        )
+        if previous and previous[0] != digest:
+            self._drop_blob(conn, previous[0])
+
+    def _rfp_entry(self, conn, row, tools=None) -> dict:
+        rfp_id = row[0]
+        entry = dict(zip(RFP_FIELDS, row[1:]))
+        query = (
+            "SELECT t.tool, t.timestamp, t.raw, b.data FROM tool_results t JOIN blobs b ON b.hash = t.result_hash "
+            "WHERE t.rfp_id = ?"
+        )
+        params = [rfp_id]
+        if tools is not None:
+            query += f" AND t.tool IN ({','.join('?' * len(tools))})"
+            params += list(tools)
+        rows = conn.execute(query + " ORDER BY t.rowid", params).fetchall()
+        results = self._resolve(conn, [json.loads(data) for _, _, _, data in rows])
+        entry["tools"] = {
+            tool: result if raw else {"timestamp": timestamp, "result": result}
+            for (tool, timestamp, raw, _), result in zip(rows, results)
+        }
+        return entry
+
+    def _load_logs(self) -> dict:
+        """Every RFP log as one dict (whole-history read; prefer get_rfp_data)."""
+        with self._connect() as conn:
+            rows = conn.execute(f"SELECT rfp_id, {', '.join(RFP_FIELDS)} FROM rfps ORDER BY rowid").fetchall()
+            return {row[0]: self._rfp_entry(conn, row) for row in rows}
+
+    def _save_logs(self, logs: dict, conn=None):
+        """Upsert every RFP of a logs dict in the JSON layout."""
+        if conn is None:
+            with self._connect(write=True) as conn:
+                return self._save_logs(logs, conn)
+        for rfp_id, entry in logs.items():
+            conn.execute(
+                f"INSERT OR REPLACE INTO rfps (rfp_id, {', '.join(RFP_FIELDS)}) VALUES (?{', ?' * len(RFP_FIELDS)})",
+                (rfp_id, *(entry.get(f) for f in RFP_FIELDS)),
+            )
+            for tool, record in entry.get("tools", {}).items():
+                if isinstance(record, dict) and set(record) == {"timestamp", "result"}:
+                    self._set_tool(conn, rfp_id, tool, record["timestamp"], record["result"])
+                else:
+                    self._set_tool(conn, rfp_id, tool, None, record, raw=True)
 
     def _generate_doc_id(self, rfp_number: str, issue_date: str, client_name: str) -> str:
         stable_data = f"{rfp_number}_{issue_date}_{client_name}"
         return hashlib.sha256(stable_data.encode("utf-8")).hexdigest()
 
-    def _update_tool(self, logs: dict, rfp_id: str, tool: str, result: dict):
+    def _update_tool(self, rfp_id: str, tool: str, result: dict):
         """Add or update results for a specific tool in logs."""
-        if rfp_id not in logs:
-            raise ValueError(f"RFP ID {rfp_id} not found in logs.")
-
-        logs[rfp_id]["tools"][tool] = {
-            "timestamp": datetime.now().isoformat(),
-            "result": result
-        }
-        logs[rfp_id]["last_updated"] = datetime.now().isoformat()
-        return logs
+        now = datetime.now().isoformat()
+        with self._connect(write=True) as conn:
+            updated = conn.execute("UPDATE rfps SET last_updated = ? WHERE rfp_id = ?", (now, rfp_id)).rowcount
+            if not updated:
+                raise ValueError(f"RFP ID {rfp_id} not found in logs.")
+            self._set_tool(conn, rfp_id, tool, now, result)
 
     # ------------------------
     # Public APIs
     # ------------------------
     def log_rfp(self, document_name: str, extracted_data: dict,
                 rfp_number: str, issue_date: str, client_name: str) -> str:
-        logs = self._load_logs()
         rfp_id = self._generate_doc_id(rfp_number, issue_date, client_name)
+        now = datetime.now().isoformat()
 
-        if rfp_id not in logs:
-            logs[rfp_id] = {
-                "document_name": document_name,
-                "rfp_number": rfp_number,
-                "issue_date": issue_date,
-                "client_name": client_name,
-                "created_at": datetime.now().isoformat(),
-                "last_updated": datetime.now().isoformat(),
-                "tools": {"summary": {"timestamp": datetime.now().isoformat(),
-                                      "result": extracted_data}}
-            }
+        with self._connect(write=True) as conn:
+            exists = conn.execute("SELECT 1 FROM rfps WHERE rfp_id = ?", (rfp_id,)).fetchone()
+            if not exists:
+                conn.execute(
+                    f"INSERT INTO rfps (rfp_id, {', '.join(RFP_FIELDS)}) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (rfp_id, document_name, rfp_number, issue_date, client_name, now, now),
+                )
+            else:
+                conn.execute("UPDATE rfps SET last_updated = ? WHERE rfp_id = ?", (now, rfp_id))
+            self._set_tool(conn, rfp_id, "summary", now, extracted_data)
+
+        if not exists:
             self.logger.info(f"New RFP logged: {document_name} ({rfp_id})")
         else:
-            logs[rfp_id]["tools"]["summary"] = {
-                "timestamp": datetime.now().isoformat(),
-                "result": extracted_data
-            }
-            logs[rfp_id]["last_updated"] = datetime.now().isoformat()
             self.logger.info(f"Updated summary for RFP {rfp_id}")
-
-        self._save_logs(logs)
         return rfp_id
 
     def log_match(self, rfp_id: str, result: dict):
-        logs = self._load_logs()
-        logs = self._update_tool(logs, rfp_id, "matching", result)
-        self._save_logs(logs)
+        self._update_tool(rfp_id, "matching", result)
         self.logger.info(f"Matching results logged for RFP {rfp_id}")
         return rfp_id
 
     def log_quotation(self, rfp_id: str, result: dict):
-        logs = self._load_logs()
-        logs = self._update_tool(logs, rfp_id, "quotation", result)
-        self._save_logs(logs)
+        self._update_tool(rfp_id, "quotation", result)
         self.logger.info(f"Quotation logged for RFP {rfp_id}")
         return rfp_id
 
     def log_proposal(self, rfp_id: str, result: dict):
-        logs = self._load_logs()
-        logs = self._update_tool(logs, rfp_id, "proposal", result)
-        self._save_logs(logs)
+        self._update_tool(rfp_id, "proposal", result)
         self.logger.info(f"proposal logged for RFP {rfp_id}")
         return rfp_id
 
     def log_cutsheet(self, rfp_id: str, result: dict):
-        logs = self._load_logs()
-        logs = self._update_tool(logs, rfp_id, "cutsheet", result)
-        self._save_logs(logs)
+        self._update_tool(rfp_id, "cutsheet", result)
         self.logger.info(f"Cutsheet logged for RFP {rfp_id}")
         return rfp_id
-    
+
     def log_email(self, rfp_id: str, result: dict):
-        logs = self._load_logs()
-        logs = self._update_tool(logs, rfp_id, "email", result)
-        self._save_logs(logs)
+        self._update_tool(rfp_id, "email", result)
         self.logger.info(f"Email logged for RFP {rfp_id}")
         return rfp_id
 
-    def get_rfp_data(self, rfp_id: str) -> dict:
-        logs = self._load_logs()
-        return logs.get(rfp_id, {})
+    def update_tool(self, rfp_id: str, tool: str, update):
+        """
+        Read-modify-write one tool result in a single transaction: `update` gets
+        the stored result (None if there is none) and returns the new one.
+        Raises inside `update` leave the stored result unchanged.
+        """
+        now = datetime.now().isoformat()
+        with self._connect(write=True) as conn:
+            if not conn.execute("UPDATE rfps SET last_updated = ? WHERE rfp_id = ?", (now, rfp_id)).rowcount:
+                raise ValueError(f"RFP ID {rfp_id} not found in logs.")
+            row = conn.execute(
+                "SELECT b.data FROM tool_results t JOIN blobs b ON b.hash = t.result_hash "
+                "WHERE t.rfp_id = ? AND t.tool = ? AND t.raw = 0",
+                (rfp_id, tool),
+            ).fetchone()
+            result = update(self._resolve(conn, [json.loads(row[0])])[0] if row else None)
+            self._set_tool(conn, rfp_id, tool, now, result)
+        self.logger.info(f"{tool} updated for RFP {rfp_id}")
+        return result
+
+    def get_rfp_data(self, rfp_id: str, tools: list = None) -> dict:
+        """One RFP's log; with `tools`, only those tool results are read and decompressed."""
+        with self._connect() as conn:
+            row = conn.execute(
+                f"SELECT rfp_id, {', '.join(RFP_FIELDS)} FROM rfps WHERE rfp_id = ?", (rfp_id,)
+            ).fetchone()
+            return self._rfp_entry(conn, row, tools) if row else {}
 
     def list_all_logs(self) -> dict:
-        return self._load_logs()
\ No newline at end of file
+        return self._load_logs()
+
+    # ------------------------
+    # Filtered reads
+    # ------------------------
+    # Filters shared by list_rfps / count_rfps / iter_rfp_data:
+    #   client  case-insensitive substring of client_name
+    #   since / until  inclusive YYYY-MM-DD bounds on created_at
+    #   has_tools  only RFPs that have a result for every one of these tools
+    def _filter_sql(self, client=None, since=None, until=None, has_tools=None):
+        where, params = [], []
+        if client:
+            where.append("r.client_name LIKE ? ESCAPE '\\'")
+            params.append("%" + client.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        if since:
+            where.append("substr(r.created_at, 1, 10) >= ?")
+            params.append(str(since))
+        if until:
+            where.append("substr(r.created_at, 1, 10) <= ?")
+            params.append(str(until))
+        for tool in has_tools or []:
+            where.append("EXISTS (SELECT 1 FROM tool_results t WHERE t.rfp_id = r.rfp_id AND t.tool = ?)")
+            params.append(tool)
+        return (" WHERE " + " AND ".join(where)) if where else "", params
+
+    def count_rfps(self, **filters) -> int:
+        where, params = self._filter_sql(**filters)
+        with self._connect() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM rfps r{where}", params).fetchone()[0]
+
+    def list_rfps(self, limit: int = None, offset: int = 0, **filters) -> list:
+        """RFP metadata and the names of their logged tools, without reading any result."""
+        where, params = self._filter_sql(**filters)
+        query = (
+            f"SELECT r.rfp_id, {', '.join('r.' + f for f in RFP_FIELDS)}, "
+            "(SELECT group_concat(t.tool, ',') FROM tool_results t WHERE t.rfp_id = r.rfp_id) "
+            f"FROM rfps r{where} ORDER BY r.created_at, r.rowid LIMIT ? OFFSET ?"
+        )
+        with self._connect() as conn:
+            rows = conn.execute(query, params + [-1 if limit is None else limit, offset]).fetchall()
+        return [
+            {"rfp_id": row[0], **dict(zip(RFP_FIELDS, row[1:-1])), "tools": row[-1].split(",") if row[-1] else []}
+            for row in rows
+        ]
+
+    def iter_rfp_data(self, tools: list = None, **filters):
+        """
+        Yield (rfp_id, entry) one RFP at a time from a single read snapshot,
+        so a full export never holds more than one RFP in memory.
+        `tools` limits the results read per RFP (see get_rfp_data).
+        """
+        where, params = self._filter_sql(**filters)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"SELECT r.rfp_id, {', '.join('r.' + f for f in RFP_FIELDS)} FROM rfps r{where} "
+                "ORDER BY r.created_at, r.rowid",
+                params,
+            )
+            for row in cursor:
+                yield row[0], self._rfp_entry(conn, row, tools)
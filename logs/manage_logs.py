@@ -1,53 +1,95 @@
 import argparse
+import gzip
 import json
+import math
+import sys
+from datetime import date
 from data_logging import data_logger
 
 log = data_logger()
 
-def list_all():
-    logs = log.list_all_logs()
-    print(f"\n📑 Found {len(logs)} RFP logs\n")
-    for rfp_id, entry in logs.items():
-        print(f"ID: {rfp_id[:12]}...")
+def filters_from(args):
+    return {"client": args.client, "since": args.since, "until": args.until, "has_tools": args.has_tool}
+
+def list_all(filters, page=1, page_size=20):
+    total = log.count_rfps(**filters)
+    pages = max(1, math.ceil(total / page_size))
+    entries = log.list_rfps(limit=page_size, offset=(page - 1) * page_size, **filters)
+    print(f"\n📑 Found {total} RFP logs (page {page} of {pages})\n")
+    for entry in entries:
+        print(f"ID: {entry['rfp_id'][:12]}...")
         print(f"  Document: {entry.get('document_name')}")
         print(f"  RFP Number: {entry.get('rfp_number')}")
         print(f"  Client: {entry.get('client_name')}")
         print(f"  Last Updated: {entry.get('last_updated')}")
-        print(f"  Tools Logged: {', '.join(entry.get('tools', {}).keys())}")
+        print(f"  Tools Logged: {', '.join(entry['tools'])}")
         print("")
 
-def view_rfp(rfp_id):
-    entry = log.get_rfp_data(rfp_id)
+def view_rfp(rfp_id, tools=None):
+    entry = log.get_rfp_data(rfp_id, tools=tools)
     if not entry:
         print(f"❌ No log found for RFP ID: {rfp_id}")
         return
+    if tools:
+        missing = [t for t in tools if t not in entry["tools"]]
+        if missing:
+            print(f"❌ No {', '.join(missing)} result logged for RFP ID: {rfp_id}")
+        entry = entry["tools"]
     print(json.dumps(entry, indent=4))
 
-def export_all(outfile):
-    logs = log.list_all_logs()
-    with open(outfile, "w") as f:
-        json.dump(logs, f, indent=4)
-    print(f"✅ Exported {len(logs)} logs to {outfile}")
+def export_all(outfile, filters, tools=None, compress=False):
+    """Write one JSON object per line ({"rfp_id": ..., **entry}), one RFP at a time."""
+    compress = compress or outfile.endswith(".gz")
+    if outfile == "-":
+        # closing a GzipFile writes the gzip trailer but leaves stdout open
+        f = gzip.open(sys.stdout.buffer, "wt", encoding="utf-8", compresslevel=6) if compress else sys.stdout
+    else:
+        f = gzip.open(outfile, "wt", encoding="utf-8", compresslevel=6) if compress else open(outfile, "w", encoding="utf-8")
+    count = 0
+    try:
+        for rfp_id, entry in log.iter_rfp_data(tools=tools, **filters):
+            f.write(json.dumps({"rfp_id": rfp_id, **entry}, separators=(",", ":")) + "\n")
+            count += 1
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    print(f"✅ Exported {count} logs to {outfile}", file=sys.stderr)
+
+def add_filters(parser):
+    parser.add_argument("--client", help="Client name contains (case-insensitive)")
+    parser.add_argument("--since", type=date.fromisoformat, help="Created on or after YYYY-MM-DD")
+    parser.add_argument("--until", type=date.fromisoformat, help="Created on or before YYYY-MM-DD")
+    parser.add_argument("--has-tool", action="append", metavar="TOOL",
+                        help="Only RFPs with a logged result for TOOL (repeatable)")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Manage MCP RFP logs")
     subparsers = parser.add_subparsers(dest="command")
 
-    subparsers.add_parser("list", help="List all logged RFPs")
+    list_parser = subparsers.add_parser("list", help="List logged RFPs")
+    add_filters(list_parser)
+    list_parser.add_argument("--page", type=int, default=1)
+    list_parser.add_argument("--page-size", type=int, default=20)
 
     view_parser = subparsers.add_parser("view", help="View a specific RFP log")
     view_parser.add_argument("rfp_id", help="The RFP ID to view")
+    view_parser.add_argument("--tool", action="append", metavar="TOOL",
+                             help="Only show (and only read) this tool's result (repeatable)")
 
-    export_parser = subparsers.add_parser("export", help="Export all logs to a JSON file")
-    export_parser.add_argument("outfile", help="Output file path")
+    export_parser = subparsers.add_parser("export", help="Export logs as JSON Lines, one RFP per line")
+    export_parser.add_argument("outfile", help="Output file path ('-' for stdout; '.gz' or --gzip compresses)")
+    export_parser.add_argument("--gzip", action="store_true", help="gzip the output")
+    export_parser.add_argument("--tool", action="append", metavar="TOOL",
+                               help="Only export this tool's result per RFP (repeatable)")
+    add_filters(export_parser)
 
     args = parser.parse_args()
 
     if args.command == "list":
-        list_all()
+        list_all(filters_from(args), max(1, args.page), max(1, args.page_size))
     elif args.command == "view":
-        view_rfp(args.rfp_id)
+        view_rfp(args.rfp_id, args.tool)
     elif args.command == "export":
-        export_all(args.outfile)
+        export_all(args.outfile, filters_from(args), args.tool, args.gzip)
     else:
         parser.print_help()
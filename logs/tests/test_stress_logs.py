@@ -0,0 +1,98 @@
+import multiprocessing
+import time
+import json
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from logs.data_logging import data_logger
+from systems.shared_files import update_json
+
+# -------------------------
+# Log write stress check
+# -------------------------
+# Runs parallel writer processes against a scratch log database and a scratch
+# html_content.json, the way several MCP servers write while RFPs run side by
+# side, and checks that no update was lost:
+#   python -m pytest -s logs/tests/test_stress_logs.py
+# The load is set with STRESS_WORKERS, STRESS_WRITES (per worker and RFP) and
+# STRESS_RFPS (default 4 x 10 x 2), e.g. for a heavier run:
+#   STRESS_WORKERS=8 STRESS_WRITES=50 STRESS_RFPS=3 python -m pytest -s logs/tests/test_stress_logs.py
+# Each writer, for every RFP, increments a counter with update_tool, increments
+# another under lock(rfp_id) with a plain get/log round trip, logs its own
+# tool result, and increments a counter in the shared JSON file.
+
+STRESS_WORKERS = int(os.getenv("STRESS_WORKERS", "4"))
+STRESS_WRITES = int(os.getenv("STRESS_WRITES", "10"))
+STRESS_RFPS = int(os.getenv("STRESS_RFPS", "2"))
+
+
+def open_log(workdir):
+    return data_logger(
+        log_filename=os.path.join(workdir, "rfp_logs.db"),
+        app_log=os.path.join(workdir, "rfp_app.log"),
+        legacy_filename=os.path.join(workdir, "missing.json"),
+    )
+
+
+def bump(result):
+    result = result or {"count": 0}
+    result["count"] += 1
+    return result
+
+
+def writer(workdir, worker, rfp_ids, writes):
+    log = open_log(workdir)
+    log.logger.disabled = True
+    json_path = os.path.join(workdir, "html_content.json")
+    for i in range(writes):
+        for rfp_id in rfp_ids:
+            log.update_tool(rfp_id, "matching", bump)
+            with log.lock(rfp_id):
+                result = log.get_rfp_data(rfp_id)["tools"].get("quotation", {}).get("result")
+                log.log_quotation(rfp_id, bump(result))
+            log._update_tool(rfp_id, f"worker_{worker}", {"last": i})
+            update_json(json_path, lambda data: data.update({rfp_id: data.get(rfp_id, 0) + 1}))
+
+
+def run(workers, writes, rfps, workdir):
+    """Run the writers in `workdir` and return the list of lost updates (empty if none)."""
+    log = open_log(workdir)
+    rfp_ids = [log.log_rfp(f"stress_{n}.pdf", {"summary": ""}, f"RFP-{n}", "2025-01-01", "Stress") for n in range(rfps)]
+
+    start = time.perf_counter()
+    ctx = multiprocessing.get_context("spawn")
+    processes = [ctx.Process(target=writer, args=(workdir, w, rfp_ids, writes)) for w in range(workers)]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
+    elapsed = time.perf_counter() - start
+    failed = sum(1 for p in processes if p.exitcode)
+    if failed:
+        return [f"{failed} writer(s) failed"]
+
+    expected = workers * writes
+    with open(os.path.join(workdir, "html_content.json"), "r") as f:
+        shared = json.load(f)
+    lost = []
+    for rfp_id in rfp_ids:
+        tools = log.get_rfp_data(rfp_id)["tools"]
+        counts = {
+            "update_tool": tools["matching"]["result"]["count"],
+            "lock": tools["quotation"]["result"]["count"],
+            "html_content.json": shared.get(rfp_id, 0),
+        }
+        lost += [f"{rfp_id[:12]} {name}: {count}/{expected}" for name, count in counts.items() if count != expected]
+        missing = [w for w in range(workers) if tools.get(f"worker_{w}", {}).get("result") != {"last": writes - 1}]
+        lost += [f"{rfp_id[:12]} worker_{w}: last write missing" for w in missing]
+
+    total = workers * writes * rfps * 4
+    print(f" {total} writes by {workers} processes in {elapsed:.2f} s ({total / elapsed:.0f} writes/s), scratch dir {workdir}")
+    return lost
+
+
+def test_no_lost_updates(tmp_path):
+    lost = run(STRESS_WORKERS, STRESS_WRITES, STRESS_RFPS, str(tmp_path))
+    assert not lost, "Lost updates:\n  " + "\n  ".join(lost)
+
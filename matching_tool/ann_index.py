@@ -0,0 +1,146 @@
+import os
+import sys
+import json
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.shared_files import atomic_save_npy, atomic_write_json
+
+# -------------------------
+# IVF (inverted file) index
+# -------------------------
+# Product embeddings are clustered into `n_lists` cells with spherical k-means.
+# A query only scans the `nprobe` cells whose centroids are closest to it, so
+# top-k lookups touch roughly nprobe / n_lists of the catalog instead of all of it.
+#
+# On disk the index is a directory of plain .npy files (opened with mmap) plus a
+# small JSON header, so loading it is a handful of mmap calls. Cell vectors are
+# kept as float16; they only pick candidates, which are re-scored afterwards.
+
+INDEX_VERSION = 2
+
+
+def _normalize(mat):
+    mat = np.asarray(mat, dtype=np.float32)
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / (norms + 1e-8)
+
+
+def _assign(vectors, centroids, batch_size=8192):
+    """Return the index of the closest centroid (cosine) for every vector."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        chunk = vectors[start:start + batch_size]
+        labels[start:start + batch_size] = np.argmax(chunk @ centroids.T, axis=1)
+    return labels
+
+
+class IVFIndex:
+    def __init__(self, centroids, offsets, ids, vectors, fingerprint, nprobe=8):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.fingerprint = fingerprint
+        self.nprobe = min(nprobe, len(centroids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, embeddings, fingerprint, n_lists=None, n_iter=10, nprobe=8, seed=0):
+        vectors = _normalize(embeddings)
+        n = len(vectors)
+        if n == 0:
+            raise ValueError("❌ Cannot build an ANN index over an empty embedding matrix")
+
+        if n_lists is None:
+            n_lists = int(np.sqrt(n))
+        n_lists = max(1, min(n_lists, n))
+
+        # Spherical k-means, trained on a sample for large catalogs
+        rng = np.random.default_rng(seed)
+        sample = vectors[rng.choice(n, size=min(n, n_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            labels = _assign(sample, centroids)
+            for c in range(n_lists):
+                members = sample[labels == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize(centroids)
+
+        # Bucket every vector into its cell; rows are stored cell-contiguous
+        labels = _assign(vectors, centroids)
+        order = np.argsort(labels, kind="stable").astype(np.int64)
+        counts = np.bincount(labels, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        return cls(centroids, offsets, order, vectors[order].astype(np.float16), fingerprint, nprobe=nprobe)
+
+    def save(self, path):
+        os.makedirs(path, exist_ok=True)
+        header_path = os.path.join(path, "header.json")
+        if os.path.exists(header_path):
+            os.remove(header_path)
+        atomic_save_npy(os.path.join(path, "centroids.npy"), self.centroids)
+        atomic_save_npy(os.path.join(path, "offsets.npy"), self.offsets)
+        atomic_save_npy(os.path.join(path, "ids.npy"), np.asarray(self.ids))
+        atomic_save_npy(os.path.join(path, "vectors.npy"), np.asarray(self.vectors))
+        header = {
+            "version": INDEX_VERSION,
+            "fingerprint": self.fingerprint,
+            "size": len(self.ids),
+            "n_lists": len(self.centroids),
+            "dim": int(self.vectors.shape[1]),
+        }
+        atomic_write_json(header_path, header, indent=None)  # last, as in EmbeddingStore.build
+
+    @classmethod
+    def load(cls, path, fingerprint=None, nprobe=8):
+        """Open an index from disk, or return None if it is missing or stale."""
+        header_path = os.path.join(path, "header.json")
+        if not os.path.exists(header_path):
+            return None
+        try:
+            with open(header_path, "r") as f:
+                header = json.load(f)
+            if header.get("version") != INDEX_VERSION:
+                return None
+            if fingerprint is not None and header.get("fingerprint") != fingerprint:
+                return None
+            return cls(
+                np.load(os.path.join(path, "centroids.npy")),
+                np.load(os.path.join(path, "offsets.npy")),
+                np.load(os.path.join(path, "ids.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, "vectors.npy"), mmap_mode="r"),
+                header["fingerprint"],
+                nprobe=nprobe,
+            )
+        except Exception:
+            return None
+
+    def search(self, query_embs, top_k=50):
+        """
+        Return (ids, sims) lists with up to `top_k` nearest rows per query,
+        ids being row numbers of the matrix the index was built from.
+        """
+        queries = _normalize(np.atleast_2d(query_embs))
+        probe = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :self.nprobe]
+
+        results_ids, results_sims = [], []
+        for q, cells in zip(queries, probe):
+            rows = np.concatenate([
+                np.arange(self.offsets[c], self.offsets[c + 1]) for c in cells
+            ])
+            if len(rows) == 0:
+                results_ids.append(np.empty(0, dtype=np.int64))
+                results_sims.append(np.empty(0, dtype=np.float32))
+                continue
+            sims = np.asarray(self.vectors[rows], dtype=np.float32) @ q
+            k = min(top_k, len(rows))
+            best = np.argpartition(-sims, k - 1)[:k]
+            best = best[np.argsort(-sims[best])]
+            results_ids.append(np.asarray(self.ids[rows[best]]))
+            results_sims.append(sims[best])
+        return results_ids, results_sims
@@ -0,0 +1,70 @@
+import json
+import random
+
+# -------------------------
+# Synthetic catalogs
+# -------------------------
+# Builds a price list in the same nested shape as
+# api_calls.get_enterprise_price_list, filled with `size` products: the labelled
+# products of a fixture plus generated filler. Filler product types overlap with
+# the fixture's categories (chairs, tables, storage...) but never repeat a
+# labelled product, so the fixture labels stay unambiguous at any size.
+
+ENTERPRISES = ("BLD", "SCH", "CRA")
+
+FILLER_TYPES = [
+    ("Guest Chair", "Seating"), ("Side Chair", "Seating"), ("Stacking Chair", "Seating"),
+    ("Bar Stool with Back", "Seating"), ("Bench Seating", "Seating"), ("Ottoman", "Lounge Seating"),
+    ("Training Table", "Tables"), ("Dining Table", "Tables"), ("Side Table", "Occasional Tables"),
+    ("End Table", "Occasional Tables"), ("Bookcase", "Storage"), ("Storage Cabinet", "Storage"),
+    ("Wardrobe Tower", "Storage"), ("Vertical File", "Storage"), ("Locker Unit", "Storage"),
+    ("Credenza", "Storage"), ("Markerboard", "Markerboards"), ("Tackboard", "Markerboards"),
+    ("Acoustic Wall Panel", "Acoustic Panels"), ("Freestanding Panel", "Partitions"),
+    ("Monitor Arm", "Accessories"), ("Keyboard Tray", "Accessories"), ("Coat Rack", "Accessories"),
+]
+FINISHES = [
+    "Walnut", "Maple", "Oak", "Cherry", "Espresso", "Grey", "Navy", "Charcoal", "Sand",
+    "Teal", "Graphite", "Natural", "Laminate", "Veneer", "Powder Coat", "Fabric", "Vinyl",
+]
+
+
+def _product(code, description, category, price):
+    return {
+        "code": code,
+        "description": description,
+        "productCategory": [{"productCategory": category}],
+        "BasePrice": [{"price": price}],
+    }
+
+
+def synthetic_price_list(size, fixture=None, enterprises=ENTERPRISES, seed=0):
+    """Return a price list with `size` products (at least the fixture's labelled products)."""
+    rng = random.Random(seed)
+    catalog = {ent: [] for ent in enterprises}
+
+    for p in (fixture or {}).get("products", []):
+        catalog.setdefault(p["enterprise"], []).append(
+            _product(p["code"], p["description"], p["category"], 100.0)
+        )
+
+    planted = sum(len(items) for items in catalog.values())
+    ents = list(catalog)
+    for i in range(max(0, size - planted)):
+        ent = ents[i % len(ents)]
+        kind, category = rng.choice(FILLER_TYPES)
+        description = (
+            f"{kind} {rng.choice(FINISHES)} {rng.choice(FINISHES)} "
+            f"{rng.randint(12, 96)}w x {rng.randint(12, 48)}d x {rng.randint(16, 84)}h"
+        )
+        catalog[ent].append(_product(f"{ent}-SYN{i:07d}", description, category, round(rng.uniform(40, 4000), 2)))
+
+    edges = [
+        {"node": {"code": ent, "children": [{"children": [{"key": "Product", "children": items}]}]}}
+        for ent, items in catalog.items()
+    ]
+    return {"data": {"getEnterpriseListing": {"edges": edges}}}
+
+
+def load_fixture(path):
+    with open(path, "r") as f:
+        return json.load(f)
@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+# -------------------------
+# Matching benchmark
+# -------------------------
+# Runs the labelled requirement lines of a fixture against synthetic catalogs of
+# increasing size and reports, per size:
+#   build_seconds            time to build (or load) the matcher
+#   latency_ms               p50 / p95 / p99 / mean of single-query search()
+#   throughput_qps           queries per second through search_many()
+#   peak_rss_mb              peak resident memory of the run
+#   precision_at_k/recall_at_k  over the labelled lines, from rank_many()
+#   accuracy                 share of lines whose available / not_available
+#                            decision and matched code are right (threshold applied)
+# Each size runs in its own process so peak RSS is not carried over.
+#
+#   python run.py --sizes 10000 100000 1000000 --output results.json
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.dirname(BENCH_DIR))
+sys.path.append(os.path.dirname(os.path.dirname(BENCH_DIR)))
+
+from catalog import synthetic_price_list, load_fixture
+
+DEFAULT_FIXTURE = os.path.join(BENCH_DIR, "fixtures", "iom.json")
+DEFAULT_WORK_DIR = os.path.join(BENCH_DIR, ".work")
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _percentiles(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "p50": round(float(np.percentile(samples, 50)), 3),
+        "p95": round(float(np.percentile(samples, 95)), 3),
+        "p99": round(float(np.percentile(samples, 99)), 3),
+        "mean": round(float(samples.mean()), 3),
+    }
+
+
+def _quality(requirements, ranked, results, k):
+    precision, recall, correct, per_query = [], [], 0, []
+    for req, top, result in zip(requirements, ranked, results):
+        expected = {(e["enterprise"], e["code"]) for e in req["expected"]}
+        retrieved = [(ent, code) for ent, code, _ in top[:k]]
+        hits = sum(r in expected for r in retrieved)
+        if expected:
+            precision.append(hits / k)
+            recall.append(hits / len(expected))
+
+        matched = (result.get("enterprise"), result.get("code")) if result["status"] == "available" else None
+        ok = matched in expected if expected else matched is None
+        correct += ok
+        per_query.append({
+            "description": req["description"],
+            "expected": sorted(f"{e}/{c}" for e, c in expected),
+            "matched": f"{matched[0]}/{matched[1]}" if matched else None,
+            "score": result.get("similarity"),
+            "top_k": [f"{ent}/{code}" for ent, code in retrieved],
+            "correct": ok,
+        })
+
+    return {
+        f"precision_at_{k}": round(float(np.mean(precision)), 4) if precision else None,
+        f"recall_at_{k}": round(float(np.mean(recall)), 4) if recall else None,
+        "accuracy": round(correct / len(requirements), 4),
+    }, per_query
+
+
+def run_size(size, fixture_path, k, repeat, batch_size, model_kwargs, work_dir):
+    """Benchmark one catalog size; meant to run in a fresh process."""
+    from finder import ProductSearchModel
+    from systems.embeddings import embedding_stats
+
+    fixture = load_fixture(fixture_path)
+    requirements = fixture["requirements"]
+    queries = [r["description"] for r in requirements]
+    price_list = synthetic_price_list(size, fixture)
+
+    os.makedirs(work_dir, exist_ok=True)
+    os.chdir(work_dir)  # index shards are written next to the embedding cache
+
+    start = time.perf_counter()
+    model = ProductSearchModel(price_list, cache_path=os.path.join(work_dir, "product_embeddings.npy"), **model_kwargs)
+    build_seconds = time.perf_counter() - start
+
+    model.search_many(queries[:1])  # warm-up: embedder, page cache
+
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            model.search(query)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = model.search_many(queries, batch_size=batch_size)
+    throughput = repeat * len(queries) / (time.perf_counter() - start)
+
+    quality, per_query = _quality(requirements, model.rank_many(queries, k=k, batch_size=batch_size), results, k)
+    return {
+        "size": len(model.codes),
+        "queries": len(queries),
+        "build_seconds": round(build_seconds, 3),
+        "latency_ms": _percentiles(latencies),
+        "throughput_qps": round(throughput, 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "matcher_memory_mb": round(model.memory_usage() / (1024 * 1024), 1),
+        "embedding": embedding_stats(),
+        **quality,
+        "per_query": per_query,
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark ProductSearchModel latency, memory and matching quality")
+    parser.add_argument("--fixture", default=DEFAULT_FIXTURE)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000])
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="Passes over the query set per measurement")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--threshold", type=float, default=0.4)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--store-dtype", default="int8", choices=["int8", "float16"])
+    parser.add_argument("--exact-rerank", action="store_true")
+    parser.add_argument("--work-dir", default=DEFAULT_WORK_DIR, help="Embedding cache and index shards (reused across runs)")
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    from systems.embeddings import embedding_model_id, EMBEDDING_BACKEND
+
+    model_kwargs = {
+        "threshold": args.threshold,
+        "nprobe": args.nprobe,
+        "store_dtype": args.store_dtype,
+        "exact_rerank": args.exact_rerank,
+    }
+    report = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "fixture": os.path.basename(args.fixture),
+        "embedding_model": embedding_model_id(),
+        "embedding_backend": EMBEDDING_BACKEND,
+        "config": {**model_kwargs, "k": args.k, "repeat": args.repeat, "batch_size": args.batch_size},
+        "runs": [],
+    }
+
+    context = multiprocessing.get_context("spawn")
+    for size in args.sizes:
+        print(f" Benchmarking catalog of {size} products...", file=sys.stderr)
+        # Not a multiprocessing.Pool: its daemonic workers could not start the bulk indexer's pool
+        with ProcessPoolExecutor(1, mp_context=context) as pool:
+            run = pool.submit(
+                run_size, size, os.path.abspath(args.fixture), args.k, args.repeat, args.batch_size,
+                model_kwargs, os.path.abspath(args.work_dir),
+            ).result()
+        summary = {key: value for key, value in run.items() if key != "per_query"}
+        print(f"✅ {json.dumps(summary)}", file=sys.stderr)
+        report["runs"].append(run)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+        print(f"✅ Report written to {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import os
+import sys
+import glob
+import hashlib
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.shared_files import atomic_save_npy, file_lock
+
+# -------------------------
+# Content-addressed embedding cache
+# -------------------------
+# Each vector is stored under sha1(model name + normalized description), so the
+# cache does not care which catalog (or which enterprise) a description came
+# from, or at which position. A catalog change only encodes the descriptions
+# whose text is new, and several catalogs can share one cache file.
+#
+# The cache is a base .npy structured array of (key, vector) records plus
+# append-only shard files in `<path>.d/`, all opened with mmap. A save writes
+# only the new records as one shard (named after its first row number, so the
+# rows keep their order); once there are COMPACT_SHARDS shards they are folded
+# into the base. Every read and write holds `<path>.lock`, so processes
+# encoding side by side never drop each other's vectors.
+
+COMPACT_SHARDS = int(os.getenv("EMBEDDING_CACHE_COMPACT_SHARDS", "16"))
+
+
+def normalize_text(text: str) -> str:
+    # all-MiniLM-L6-v2 is uncased and whitespace-insensitive, so texts that
+    # only differ in case or spacing share one vector
+    return " ".join(str(text).lower().split())
+
+
+class EmbeddingCache:
+    def __init__(self, path, model_name):
+        self.path = path
+        self.shard_dir = path + ".d"
+        self.model_name = model_name
+        self.parts = []
+        self.starts = []
+        self.rows = {}
+        with file_lock(self.path + ".lock"):
+            self._load()
+
+    def _dtype(self, dim):
+        return np.dtype([("key", "S40"), ("vec", "<f4", (dim,))])
+
+    def _shard_paths(self):
+        return sorted(glob.glob(os.path.join(self.shard_dir, "*.npy")))
+
+    def _load(self):
+        # Caller holds the lock, so no shard is compacted away mid-read
+        self.parts, self.starts, self.rows = [], [], {}
+        paths = ([self.path] if os.path.exists(self.path) else []) + self._shard_paths()
+        if not paths:
+            return
+        try:
+            start = 0
+            for path in paths:
+                part = np.load(path, mmap_mode="r")
+                self.parts.append(part)
+                self.starts.append(start)
+                start += len(part)
+            keys = np.concatenate([part["key"] for part in self.parts])
+            self.rows = {k: i for i, k in enumerate(keys.tolist())}
+        except Exception:
+            print(" Failed to load embedding cache. Starting empty...", file=sys.stderr)
+            self.parts, self.starts, self.rows = [], [], {}
+
+    @property
+    def dim(self):
+        return self.parts[0]["vec"].shape[1] if self.parts else None
+
+    def __len__(self):
+        return len(self.rows)
+
+    def key(self, text: str) -> bytes:
+        payload = f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.sha1(payload).hexdigest().encode("ascii")
+
+    def get_or_encode(self, texts, encode):
+        """
+        Return an (n, dim) float32 matrix for `texts`, calling `encode` only on
+        the texts that are not cached yet and persisting the new vectors.
+        """
+        return self.vectors(self.lookup(texts, encode))
+
+    def lookup(self, texts, encode):
+        """Like get_or_encode, but return cache row numbers instead of vectors."""
+        keys = [self.key(t) for t in texts]
+
+        missing = self.missing(texts)
+        if missing:
+            print(f" Encoding {len(missing)} new product descriptions...", file=sys.stderr)
+            new_vecs = np.asarray(encode(list(missing.values())), dtype=np.float32)
+            self.add(list(missing.keys()), new_vecs)
+
+        return np.fromiter((self.rows[k] for k in keys), dtype=np.int64, count=len(keys))
+
+    def missing(self, texts):
+        """Map of key -> text for the distinct texts that are not cached yet."""
+        missing = {}
+        for t in texts:
+            k = self.key(t)
+            if k not in self.rows and k not in missing:
+                missing[k] = t
+        return missing
+
+    def add(self, keys, vecs):
+        """Persist vectors for the given keys (as returned by key())."""
+        self._save(list(keys), np.asarray(vecs, dtype=np.float32))
+
+    def vectors(self, rows):
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(self.parts) == 1:
+            return np.asarray(self.parts[0]["vec"][rows], dtype=np.float32)
+        out = np.empty((len(rows), self.dim), dtype=np.float32)
+        for part, start in zip(self.parts, self.starts):
+            mask = (rows >= start) & (rows < start + len(part))
+            if mask.any():
+                out[mask] = part["vec"][rows[mask] - start]
+        return out
+
+    def _save(self, new_keys, new_vecs):
+        with file_lock(self.path + ".lock"):
+            # Re-read under the lock so vectors written by another process
+            # since we loaded are kept, and their rows are not written twice
+            self._load()
+            dim = new_vecs.shape[1]
+            if self.parts and self.dim != dim:
+                print(" Embedding dimension changed. Discarding old cache...", file=sys.stderr)
+                self._discard()
+
+            fresh = [i for i, k in enumerate(new_keys) if k not in self.rows]
+            if not fresh:
+                return
+            records = np.empty(len(fresh), dtype=self._dtype(dim))
+            records["key"] = [new_keys[i] for i in fresh]
+            records["vec"] = new_vecs[fresh]
+
+            try:
+                if not self.parts:
+                    atomic_save_npy(self.path, records)
+                else:
+                    os.makedirs(self.shard_dir, exist_ok=True)
+                    atomic_save_npy(os.path.join(self.shard_dir, f"{len(self.rows):012d}.npy"), records)
+                    if len(self.parts) >= COMPACT_SHARDS:
+                        self._compact()
+                self._load()
+            except Exception:
+                print(" Could not cache embeddings.", file=sys.stderr)
+                # keep serving from memory for this process
+                start = len(self.rows)
+                self.parts.append(records)
+                self.starts.append(start)
+                self.rows.update((k, start + i) for i, k in enumerate(records["key"].tolist()))
+
+    def _compact(self):
+        """Fold base and shards into one base file; row numbers do not change."""
+        self._load()
+        merged = np.concatenate(self.parts)
+        atomic_save_npy(self.path, merged)
+        for path in self._shard_paths():
+            os.remove(path)
+
+    def _discard(self):
+        for path in [self.path] + self._shard_paths():
+            if os.path.exists(path):
+                os.remove(path)
+        self.parts, self.starts, self.rows = [], [], {}
@@ -0,0 +1,150 @@
+import os
+import sys
+import json
+import shutil
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.shared_files import atomic_save_npy, atomic_write_json
+
+# -------------------------
+# Quantized, memory-mapped embedding store
+# -------------------------
+# One store holds the embeddings of one catalog, row-aligned with the catalog's
+# (enterprise, code) list. Vectors are L2-normalised and kept as int8 (one
+# float32 scale per row) or float16, in .npy files opened with mmap, so every
+# MCP process that opens the same store shares the same page-cache pages.
+#
+# Layout of a store directory:
+#   header.json   model, dim, dtype, fingerprint, rows [[enterprise, code], ...]
+#   data.npy      (n, dim) int8 or float16
+#   scale.npy     (n,) float32, int8 stores only
+#   norms.npy     (n,) float32 norms of the original float32 vectors
+
+STORE_VERSION = 1
+DTYPES = ("int8", "float16")
+
+
+class EmbeddingStore:
+    def __init__(self, path, header, data, scale, norms):
+        self.path = path
+        self.header = header
+        self.data = data
+        self.scale = scale
+        self.norms = norms
+
+    def __len__(self):
+        return len(self.data)
+
+    @property
+    def dim(self):
+        return self.header["dim"]
+
+    @property
+    def dtype(self):
+        return self.header["dtype"]
+
+    @property
+    def rows(self):
+        return self.header["rows"]
+
+    @property
+    def fingerprint(self):
+        return self.header["fingerprint"]
+
+    @classmethod
+    def build(cls, path, embeddings, rows, model_name, fingerprint, dtype="int8", batch_size=8192):
+        """Quantize `embeddings` (float32, row-aligned with `rows`) into a store at `path`."""
+        if dtype not in DTYPES:
+            raise ValueError(f"❌ Unsupported embedding store dtype: {dtype}")
+        n, dim = embeddings.shape
+        if n != len(rows):
+            raise ValueError("❌ Embedding rows and (enterprise, code) rows differ in length")
+
+        data = np.empty((n, dim), dtype=np.int8 if dtype == "int8" else np.float16)
+        scale = np.ones(n, dtype=np.float32)
+        norms = np.empty(n, dtype=np.float32)
+        for start in range(0, n, batch_size):
+            chunk = np.asarray(embeddings[start:start + batch_size], dtype=np.float32)
+            chunk_norms = np.linalg.norm(chunk, axis=1)
+            unit = chunk / (chunk_norms[:, None] + 1e-8)
+            norms[start:start + batch_size] = chunk_norms
+            if dtype == "int8":
+                chunk_scale = np.abs(unit).max(axis=1) / 127.0 + 1e-12
+                data[start:start + batch_size] = np.round(unit / chunk_scale[:, None]).astype(np.int8)
+                scale[start:start + batch_size] = chunk_scale
+            else:
+                data[start:start + batch_size] = unit.astype(np.float16)
+
+        os.makedirs(path, exist_ok=True)
+        header_path = os.path.join(path, "header.json")
+        if os.path.exists(header_path):
+            os.remove(header_path)
+        atomic_save_npy(os.path.join(path, "data.npy"), data)
+        atomic_save_npy(os.path.join(path, "scale.npy"), scale)
+        atomic_save_npy(os.path.join(path, "norms.npy"), norms)
+
+        header = {
+            "version": STORE_VERSION,
+            "model": model_name,
+            "dim": int(dim),
+            "dtype": dtype,
+            "fingerprint": fingerprint,
+            "rows": [list(r) for r in rows],
+        }
+        # Header last: a store without a header is treated as missing
+        atomic_write_json(header_path, header, indent=None)
+        return cls.open(path)
+
+    @classmethod
+    def open(cls, path, fingerprint=None, dtype=None):
+        """Memory-map a store, or return None if it is missing, stale or of another dtype."""
+        header_path = os.path.join(path, "header.json")
+        if not os.path.exists(header_path):
+            return None
+        try:
+            with open(header_path, "r") as f:
+                header = json.load(f)
+            if header.get("version") != STORE_VERSION:
+                return None
+            if fingerprint is not None and header.get("fingerprint") != fingerprint:
+                return None
+            if dtype is not None and header.get("dtype") != dtype:
+                return None
+            return cls(
+                path,
+                header,
+                np.load(os.path.join(path, "data.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, "scale.npy"), mmap_mode="r"),
+                np.load(os.path.join(path, "norms.npy"), mmap_mode="r"),
+            )
+        except Exception:
+            return None
+
+    def vectors(self, rows=None):
+        """Dequantize rows (all rows if None) back to unit-length float32 vectors."""
+        if rows is None:
+            rows = slice(None)
+        vecs = np.asarray(self.data[rows], dtype=np.float32)
+        if self.dtype == "int8":
+            vecs *= np.asarray(self.scale[rows])[:, None]
+        return vecs
+
+    def similarity(self, query_emb, rows):
+        """Cosine similarity between one query vector and the given rows, on quantized data."""
+        query = np.asarray(query_emb, dtype=np.float32).ravel()
+        sims = np.asarray(self.data[rows], dtype=np.float32) @ query
+        if self.dtype == "int8":
+            sims *= np.asarray(self.scale[rows])
+        return sims / (np.linalg.norm(query) + 1e-8)
+
+
+def prune_stores(root, keep=8):
+    """Remove all but the `keep` most recently used store directories under `root`."""
+    if not os.path.isdir(root):
+        return
+    entries = [os.path.join(root, d) for d in os.listdir(root)]
+    entries = [d for d in entries if os.path.isdir(d)]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for stale in entries[keep:]:
+        shutil.rmtree(stale, ignore_errors=True)
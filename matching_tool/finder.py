@@ -1,21 +1,25 @@
 import re
 import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
 
-from rapidfuzz import fuzz
+from rapidfuzz import fuzz, process
+from scipy.sparse import csr_matrix
 import os
-os.environ["USE_TF"] = "0"
-from sentence_transformers import SentenceTransformer
-import pickle 
+import sys
+import hashlib
+from ann_index import IVFIndex
+from embedding_cache import EmbeddingCache
+from embedding_store import EmbeddingStore, prune_stores
+from indexer import bulk_index, BULK_ENCODE_MIN
 
-_embedder = None  # will initialize only on first encode
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.embeddings import get_embedder, embedding_model_id
 
-def get_embedder():
-    global _embedder
-    if _embedder is None:
-        _embedder = SentenceTransformer("all-MiniLM-L6-v2")
-    return _embedder
+# Vectors from different backends (torch / onnx / onnx-int8) are cached apart
+EMBEDDING_MODEL = embedding_model_id()
+
+def encode_descriptions(descs):
+    return get_embedder().encode(descs, device="cpu", show_progress_bar=True)
 
 # -------------------------
 # Category Helpers
@@ -54,16 +58,21 @@ def category_match_boost(req_desc: str, prod_desc: str) -> float:
         return -0.5
     return 0.0
 
+MAIN_TYPES = [
+    "task chair", "conference table", "coffee table", "desk", "lateral file",
+    "bench", "stool", "sofa", "partition", "whiteboard", "reception sofa",
+    "2-seater sofa", "3-seater sofa"
+]
+_MAIN_TYPES_LONGEST_FIRST = sorted(MAIN_TYPES, key=lambda x: -len(x))
+
 def extract_main_type(query, all_types=None):
     query_lower = query.lower()
     if all_types is None:
-        all_types = [
-            "task chair", "conference table", "coffee table", "desk", "lateral file",
-            "bench", "stool", "sofa", "partition", "whiteboard", "reception sofa",
-            "2-seater sofa", "3-seater sofa"
-        ]
+        types_longest_first = _MAIN_TYPES_LONGEST_FIRST
+    else:
+        types_longest_first = sorted(all_types, key=lambda x: -len(x))
     # check for exact type matches first
-    for t in sorted(all_types, key=lambda x: -len(x)):  # longest first
+    for t in types_longest_first:  # longest first
         if t in query_lower or t.rstrip("s") in query_lower:
             return t
     # fallback to first two meaningful words
@@ -136,70 +145,325 @@ def score_product(query, desc, prod_category, embedding_sim, query_tokens):
 
     return score
 
+# -------------------------
+# Feature Table
+# -------------------------
+# Everything score_product derives from the product description is a pure
+# function of it, so it is computed once per catalog into columnar arrays.
+# Query-time scoring then only computes the query-side features once per query.
+FEATURES_VERSION = 1
+
+class QueryFeatures:
+    def __init__(self, query: str):
+        self.query = query
+        self.text = query.lower()
+        self.non_dimensions = extract_non_dimensions(query)
+        self.category = extract_non_dimensions(normalize_category(query))
+        self.main_type = extract_main_type(query)
+        dimensions = extract_dimensions(query)
+        self.has_dimensions = bool(dimensions)
+        self.dimensions = [d for d in dimensions if d.strip()]
+        self.tokens = set(re.findall(r'\w+', self.text))
+
+class ProductFeatures:
+    """
+    Per-product features, row-aligned with ProductSearchModel.descs:
+    normalized text, category and main type (as codes into label arrays),
+    the \\w+ token sets (as a CSR row/column incidence matrix) and the tokens
+    of the enterprise category used by has_token_overlap.
+    """
+    def __init__(self, text, category_labels, category, main_type_labels, main_type,
+                 vocab, token_indices, token_indptr, enterprise_tokens, enterprise):
+        self.text = text
+        self.category_labels = category_labels
+        self.category = category
+        self.main_type_labels = main_type_labels
+        self.main_type = main_type
+        self.vocab = vocab
+        self.token_indices = token_indices
+        self.token_indptr = token_indptr
+        self.enterprise_tokens = enterprise_tokens
+        self.enterprise = enterprise
+        self.token_columns = {tok: i for i, tok in enumerate(vocab.tolist())}
+        self.token_matrix = csr_matrix(
+            (np.ones(len(token_indices), dtype=np.float64), token_indices, token_indptr),
+            shape=(len(text), len(vocab)),
+        )
+
+    def __len__(self):
+        return len(self.text)
+
+    @classmethod
+    def build(cls, descs, codes, prods):
+        text = np.array([d.lower() for d in descs])
+
+        categories = [extract_non_dimensions(normalize_category(d)) for d in descs]
+        category_labels, category = np.unique(categories, return_inverse=True)
+        main_types = [extract_main_type(d) for d in descs]
+        main_type_labels, main_type = np.unique(main_types, return_inverse=True)
+
+        vocab, token_indices, token_indptr = {}, [], [0]
+        for t in text:
+            for tok in set(re.findall(r'\w+', t)):
+                token_indices.append(vocab.setdefault(tok, len(vocab)))
+            token_indptr.append(len(token_indices))
+
+        # has_token_overlap compares against the category of each enterprise's first product
+        enterprises = list(prods.keys())
+        enterprise_tokens = np.array([
+            " ".join(re.findall(r"\w+", ((prods[ent][0].get("category") if prods[ent] else "") or "").lower()))
+            for ent in enterprises
+        ])
+        ent_index = {ent: i for i, ent in enumerate(enterprises)}
+        enterprise = np.array([ent_index[ent] for ent, _ in codes], dtype=np.int32)
+
+        return cls(
+            text,
+            category_labels, category.astype(np.int32),
+            main_type_labels, main_type.astype(np.int32),
+            np.array(list(vocab.keys()) or [""]),
+            np.array(token_indices, dtype=np.int32),
+            np.array(token_indptr, dtype=np.int64),
+            enterprise_tokens, enterprise,
+        )
+
+    def save(self, path):
+        np.savez(
+            path,
+            version=FEATURES_VERSION,
+            text=self.text,
+            category_labels=self.category_labels, category=self.category,
+            main_type_labels=self.main_type_labels, main_type=self.main_type,
+            vocab=self.vocab, token_indices=self.token_indices, token_indptr=self.token_indptr,
+            enterprise_tokens=self.enterprise_tokens, enterprise=self.enterprise,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """Load a saved feature table, or return None if it is missing or outdated."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as f:
+                if int(f["version"]) != FEATURES_VERSION:
+                    return None
+                return cls(
+                    f["text"],
+                    f["category_labels"], f["category"],
+                    f["main_type_labels"], f["main_type"],
+                    f["vocab"], f["token_indices"], f["token_indptr"],
+                    f["enterprise_tokens"], f["enterprise"],
+                )
+        except Exception:
+            return None
+
+    def query_columns(self, qf: QueryFeatures):
+        return np.array([self.token_columns[t] for t in qf.tokens if t in self.token_columns], dtype=np.int32)
+
+def rerank_features(qf: QueryFeatures, features: ProductFeatures, rows, embedding_sims):
+    """
+    Vectorized score_product over many catalog rows at once: rapidfuzz cdist
+    for the fuzzy term and NumPy masks over the feature table for the rest.
+    Returns one score per row, in the order of `rows`.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    text = features.text[rows]
+
+    # Embedding similarity
+    scores = np.asarray(embedding_sims, dtype=np.float64) * 0.5
+
+    # Fuzzy match
+    ratio = process.cdist([qf.non_dimensions], text, scorer=fuzz.token_sort_ratio, dtype=np.float64)[0] / 100.0
+    scores += np.where(ratio > 0.8, 0.3, np.where(ratio > 0.6, 0.1, -0.2))
+
+    # Category match
+    if qf.category != "other":
+        prod_cat = features.category_labels[features.category[rows]]
+        scores += np.where(prod_cat == qf.category, 0.3, np.where(prod_cat != "other", -0.5, 0.0)) * 2
+
+    # Dimension match
+    if qf.has_dimensions:
+        hit = np.zeros(len(rows), dtype=bool)
+        for d in qf.dimensions:
+            hit |= np.char.find(text, d) >= 0
+        scores += np.where(hit, 0.2, -0.3)
+
+    # Token overlap with category
+    ent_hit = np.array([
+        any(t in qf.non_dimensions for t in ent_tokens.split())
+        for ent_tokens in features.enterprise_tokens
+    ])
+    scores += np.where(ent_hit[features.enterprise[rows]], 0.2, 0.0)
+
+    # Key token overlap
+    if qf.tokens:
+        query_vec = np.zeros(len(features.vocab), dtype=np.float64)
+        query_vec[features.query_columns(qf)] = 1.0
+        common = features.token_matrix[rows] @ query_vec
+        scores += np.where(common / len(qf.tokens) > 0.5, 0.3, 0.0)
+
+    # Main type boost
+    if qf.main_type:
+        desc_main_type = features.main_type_labels[features.main_type[rows]]
+        scores += np.where(desc_main_type == qf.main_type, 1.5, 0.0)
+
+    return scores
+
 # -------------------------
 # Product Search Model
 # -------------------------
-class ProductSearchModel:
-    def __init__(self, prods, threshold=0.4, cache_path="product_embeddings.pkl"):
-        self.prods = self.get_product_list(prods)
-        self.threshold = threshold
-        self.vectorizer = TfidfVectorizer()
+class EnterpriseShard:
+    """
+    Index over one enterprise's catalog: its own TF-IDF vocabulary plus the
+    embedding store, ANN index and feature table. Shards are independent of
+    each other, so any subset of enterprises can be searched together without
+    refitting or re-encoding anything.
+    """
+    def __init__(self, enterprise, items, cache_path="product_embeddings.npy", nprobe=8, store_dtype="int8"):
+        self.enterprise = enterprise
+        self.prods = {enterprise: items}
         self.codes, self.descs = [], []
 
-        for ent, items in self.prods.items():
-            for item in items:
-                if item.get("description"):
-                    self.codes.append((ent, item.get("code")))
-                    self.descs.append(item.get("description"))
+        for item in items:
+            if item.get("description"):
+                self.codes.append((enterprise, item.get("code")))
+                self.descs.append(item.get("description"))
 
         if not self.descs:
-            raise ValueError("❌ No product descriptions found in input price_list")
+            raise ValueError(f"❌ No product descriptions found for enterprise {enterprise}")
 
         # Always fit TF-IDF on descs
+        self.vectorizer = TfidfVectorizer()
         self.matrix = self.vectorizer.fit_transform(self.descs)
 
-        # Embeddings
+        # Embeddings live in the shared content-addressed cache (float32) and,
+        # per shard, in a quantized memory-mapped store next to the ANN index
         self.cache_path = cache_path
-        self.embeddings = None
-        if os.path.exists(cache_path):
-            try:
-                with open(cache_path, "rb") as f:
-                    self.embeddings = pickle.load(f)
-                print("✅ Loaded cached product embeddings.")
-            except Exception:
-                print(" Failed to load cached embeddings. Recomputing...")
-
-        if self.embeddings is None or len(self.embeddings) != len(self.descs):
-            embedder = get_embedder()
-            self.embeddings = embedder.encode(self.descs, device="cpu", show_progress_bar=True)
-            try:
-                with open(self.cache_path, "wb") as f:
-                    pickle.dump(self.embeddings, f)
-                print("✅ Cached product embeddings.")
-            except Exception:
-                print(" Could not cache embeddings.")
-
-    def _prepare_embeddings(self):
-        if self.vectorizer is None or self.embeddings is None:
-            print(" Computing TF-IDF and embeddings for products...")
-            self.vectorizer = TfidfVectorizer()
-            if self.descs:
-                self.matrix = self.vectorizer.fit_transform(self.descs)
-            else:
-                self.matrix = None
-            self.matrix = self.vectorizer.fit_transform(self.descs)
-            embedder = get_embedder()
-            self.embeddings = embedder.encode(self.descs, device="cpu", show_progress_bar=True)
+        self.nprobe = nprobe
+        self.store_dtype = store_dtype
+        self.index_root = os.path.splitext(cache_path)[0] + ".index"
+        self.embedding_cache = None
+        self.cache_rows = None
+        self.store = None
+        self.ann_index = None
+        self.features = None
+        self._load_or_build_index()
+
+    def __len__(self):
+        return len(self.descs)
+
+    def _fingerprint(self):
+        h = hashlib.sha1(EMBEDDING_MODEL.encode("utf-8"))
+        # the feature table reads the category of the enterprise's first product
+        category = self.prods[self.enterprise][0].get("category")
+        h.update(f"{self.enterprise}\0{category}\0".encode("utf-8"))
+        for (ent, code), desc in zip(self.codes, self.descs):
+            h.update(f"{code}\0{desc}\0".encode("utf-8"))
+        return h.hexdigest()
+
+    def _load_or_build_index(self):
+        fingerprint = self._fingerprint()
+        # One directory per enterprise, so pruning old catalog versions of one
+        # enterprise never removes another enterprise's live shard
+        self.index_path = os.path.join(self.index_root, self.enterprise, f"{fingerprint}-{self.store_dtype}")
+        ivf_path = os.path.join(self.index_path, "ivf")
+
+        self.store = EmbeddingStore.open(self.index_path, fingerprint=fingerprint, dtype=self.store_dtype)
+        self.ann_index = IVFIndex.load(ivf_path, fingerprint=fingerprint, nprobe=self.nprobe)
+        self.features = ProductFeatures.load(os.path.join(self.index_path, "features.npz"))
+        if self.store is not None and self.ann_index is not None and self.features is not None:
+            os.utime(self.index_path)
+            print(f"✅ Loaded index shard for {self.enterprise}.", file=sys.stderr)
+            return
+
+        self.features = ProductFeatures.build(self.descs, self.codes, self.prods)
+
+        self.embedding_cache = EmbeddingCache(self.cache_path, EMBEDDING_MODEL)
+        if len(self.embedding_cache.missing(self.descs)) >= BULK_ENCODE_MIN:
+            # Large misses (new catalog, model change) go through the multi-process pipeline
+            bulk_index(self.descs, self.embedding_cache)
+        embeddings = self.embedding_cache.get_or_encode(self.descs, encode_descriptions)
+        try:
+            self.store = EmbeddingStore.build(
+                self.index_path, embeddings, self.codes, EMBEDDING_MODEL, fingerprint, dtype=self.store_dtype
+            )
+            self.ann_index = IVFIndex.build(self.store.vectors(), fingerprint, nprobe=self.nprobe)
+            self.ann_index.save(ivf_path)
+            self.features.save(os.path.join(self.index_path, "features.npz"))
+            prune_stores(os.path.dirname(self.index_path), keep=4)
+            print(f"✅ Cached index shard for {self.enterprise}.", file=sys.stderr)
+        except Exception:
+            print(f" Could not cache index shard for {self.enterprise}.", file=sys.stderr)
+            if self.store is None:
+                raise
+
+    def lexical_candidates(self, queries, top_k=50, batch_size=64):
+        """Per-query TF-IDF top-k as (local row ids, cosines), each of shape (len(queries), k)."""
+        k = min(top_k, self.matrix.shape[0])
+        ids, sims = [], []
+        for start in range(0, len(queries), batch_size):
+            # TF-IDF rows are L2-normalised, so the sparse product is the cosine
+            batch_sims = (self.vectorizer.transform(queries[start:start + batch_size]) @ self.matrix.T).toarray()
+            batch_ids = np.argpartition(-batch_sims, k - 1, axis=1)[:, :k]
+            ids.append(batch_ids)
+            sims.append(np.take_along_axis(batch_sims, batch_ids, axis=1))
+        return np.vstack(ids), np.vstack(sims)
+
+    def exact_similarity(self, query_emb, rows):
+        """float32 cosine similarity from the embedding cache, for re-ranking."""
+        if self.embedding_cache is None:
+            self.embedding_cache = EmbeddingCache(self.cache_path, EMBEDDING_MODEL)
+        if self.cache_rows is None:
+            self.cache_rows = self.embedding_cache.lookup(self.descs, encode_descriptions)
+        vecs = self.embedding_cache.vectors(self.cache_rows[rows])
+        return (vecs @ query_emb) / (np.linalg.norm(vecs, axis=1) * np.linalg.norm(query_emb) + 1e-8)
+
+    def memory_usage(self):
+        """Approximate bytes held privately by this shard (mmapped stores are shared and not counted)."""
+        total = self.matrix.data.nbytes + self.matrix.indices.nbytes + self.matrix.indptr.nbytes
+        total += 64 * len(self.vectorizer.vocabulary_)
+        f = self.features
+        total += f.text.nbytes + f.category.nbytes + f.main_type.nbytes + f.vocab.nbytes
+        total += f.token_indices.nbytes + f.token_indptr.nbytes + f.enterprise.nbytes
+        total += f.token_matrix.data.nbytes + f.token_matrix.indices.nbytes + f.token_matrix.indptr.nbytes
+        total += sum(64 + len(d) for d in self.descs) + 128 * len(self.codes)
+        return total
+
+
+def _top(ids, sims, k):
+    if len(ids) <= k:
+        return ids
+    return ids[np.argpartition(-sims, k - 1)[:k]]
+
 
-            # Save cache
-            try:
-                with open(self.cache_path, "wb") as f:
-                    pickle.dump(self.embeddings, f)
-            except Exception:
-                print(" Could not cache embeddings.")
+class ProductSearchModel:
+    def __init__(self, prods, threshold=0.4, cache_path="product_embeddings.npy", nprobe=8,
+                 store_dtype="int8", exact_rerank=False, shard_provider=None):
+        self.prods = self.get_product_list(prods)
+        self.threshold = threshold
+        self.exact_rerank = exact_rerank
 
+        if not self.prods:
+            raise ValueError("❌ No product descriptions found in input price_list")
 
-    def get_product_list(self, price_list):
+        # One independent shard per enterprise; a registry can hand out warm ones
+        if shard_provider is None:
+            def shard_provider(ent, items):
+                return EnterpriseShard(ent, items, cache_path=cache_path, nprobe=nprobe, store_dtype=store_dtype)
+        self.shards = [shard_provider(ent, items) for ent, items in self.prods.items()]
+
+        self.codes, self.descs = [], []
+        for shard in self.shards:
+            self.codes.extend(shard.codes)
+            self.descs.extend(shard.descs)
+        self.offsets = np.cumsum([0] + [len(shard) for shard in self.shards])
+
+    def memory_usage(self):
+        """Approximate bytes held privately by this matcher (mmapped stores are shared and not counted)."""
+        return sum(shard.memory_usage() for shard in self.shards)
+
+    @staticmethod
+    def get_product_list(price_list):
         prods = {}
         for edge in price_list['data']['getEnterpriseListing']['edges']:
             ent_code = edge['node']['code']
@@ -220,39 +484,81 @@ class ProductSearchModel:
         return prods
 
     def search(self, query, top_k=50):
-        self._prepare_embeddings()  # ensure vectorizer & embeddings exist
-
-        if self.vectorizer is None:
-            return {"status": "not_available", "reason": "Vectorizer not initialized."}
-
-        query_vec_tfidf = self.vectorizer.transform([query])
-        sims = cosine_similarity(query_vec_tfidf, self.matrix)[0]
+        return self.search_many([query], top_k=top_k)[0]
+
+    def search_many(self, queries, top_k=50, batch_size=64):
+        """
+        Match several requirement lines at once. Queries are encoded in one
+        batch, every shard answers lexical (TF-IDF) and embedding (ANN) top-k
+        for the whole batch, and the per-shard candidates are merged into one
+        global top-k of each kind; returns one result dict per query, in order.
+        """
+        return [
+            self._best_match(query, query_emb, top_k_idx)
+            for query, query_emb, top_k_idx in self._candidates(queries, top_k, batch_size)
+        ]
 
-        top_k_idx = np.argsort(sims)[-top_k:]
+    def rank_many(self, queries, k=10, top_k=50, batch_size=64):
+        """
+        Like search_many, but return the `k` best-scored candidates per query as
+        (enterprise, code, score) tuples, best first, ignoring the threshold.
+        """
+        ranked = []
+        for query, query_emb, top_k_idx in self._candidates(queries, top_k, batch_size):
+            if len(top_k_idx) == 0:
+                ranked.append([])
+                continue
+            scores = self._scores(query, query_emb, top_k_idx)
+            order = np.argsort(-scores, kind="stable")[:k]
+            ranked.append([(*self.codes[top_k_idx[i]], float(scores[i])) for i in order])
+        return ranked
+
+    def _candidates(self, queries, top_k, batch_size):
+        queries = list(queries)
+        if not queries:
+            return []
 
         embedder = get_embedder()
-        query_emb = embedder.encode([query], device="cpu")
-        top_embeddings = self.embeddings[top_k_idx]
-        embedding_sims = np.dot(top_embeddings, query_emb.T).flatten() / (
-            np.linalg.norm(top_embeddings, axis=1) * np.linalg.norm(query_emb) + 1e-8
-        )
-
-        query_tokens = set(re.findall(r'\w+', query.lower()))
-
-        # Compute boosted scores for top-k only
-        boosted_scores = []
-        for idx, emb_sim in zip(top_k_idx, embedding_sims):
-            desc = self.descs[idx]
-            ent_code = self.codes[idx][0]
-            prod_list = self.prods.get(ent_code, [])
-            prod_category = prod_list[0].get("category", "") if prod_list else ""
-            score = score_product(query, desc, prod_category, emb_sim, query_tokens)
-            boosted_scores.append((idx, score))
+        query_embs = embedder.encode(queries, device="cpu", batch_size=batch_size)
+
+        lexical = [shard.lexical_candidates(queries, top_k, batch_size) for shard in self.shards]
+        semantic = [shard.ann_index.search(query_embs, top_k) for shard in self.shards]
+
+        candidates = []
+        for q, query in enumerate(queries):
+            # Candidates: lexical top-k plus embedding top-k from the ANN indexes,
+            # so semantic matches are not dropped for lacking shared words
+            lex_ids = np.concatenate([off + ids[q] for off, (ids, _) in zip(self.offsets, lexical)])
+            lex_sims = np.concatenate([sims[q] for _, sims in lexical])
+            ann_ids = np.concatenate([off + ids[q] for off, (ids, _) in zip(self.offsets, semantic)])
+            ann_sims = np.concatenate([sims[q] for _, sims in semantic])
+            top_k_idx = np.union1d(_top(lex_ids, lex_sims, top_k), _top(ann_ids, ann_sims, top_k)).astype(np.int64)
+            candidates.append((query, query_embs[q], top_k_idx))
+        return candidates
+
+    def _scores(self, query, query_emb, top_k_idx):
+        # Compute boosted scores for the candidates only, shard by shard
+        qf = QueryFeatures(query)
+        shard_of = np.searchsorted(self.offsets, top_k_idx, side="right") - 1
+        scores = np.empty(len(top_k_idx), dtype=np.float64)
+        for s in np.unique(shard_of):
+            mask = shard_of == s
+            shard = self.shards[s]
+            local = top_k_idx[mask] - self.offsets[s]
+            if self.exact_rerank:
+                embedding_sims = shard.exact_similarity(query_emb, local)
+            else:
+                embedding_sims = shard.store.similarity(query_emb, local)
+            scores[mask] = rerank_features(qf, shard.features, local, embedding_sims)
+        return scores
 
-        if not boosted_scores:
+    def _best_match(self, query, query_emb, top_k_idx):
+        if len(top_k_idx) == 0:
             return {"status": "not_available", "query": query, "reason": "No products found"}
 
-        best_idx, best_score = max(boosted_scores, key=lambda x: x[1])
+        scores = self._scores(query, query_emb, top_k_idx)
+        best = int(np.argmax(scores))
+        best_idx, best_score = int(top_k_idx[best]), float(scores[best])
         ent, code = self.codes[best_idx]
         best_desc = self.descs[best_idx]
         prod_category = self.prods[ent][0].get("category", "")
@@ -272,4 +578,4 @@ class ProductSearchModel:
                 "status": "not_available",
                 "query": query,
                 "reason": f"No strong match found (best score={round(best_score,3)})"
-            }
\ No newline at end of file
+            }
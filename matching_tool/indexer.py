@@ -0,0 +1,141 @@
+import os
+import sys
+import glob
+import hashlib
+import argparse
+import tempfile
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from embedding_cache import EmbeddingCache
+
+# -------------------------
+# Bulk catalog embedding
+# -------------------------
+# Used when the embedding cache misses on many descriptions at once (new
+# catalog, model or backend change). Descriptions are sorted by length so each
+# batch pads to similar lengths, cut into shards and encoded by a process pool.
+# Every finished shard is written to a checkpoint file straight away, so an
+# interrupted run picks up the finished shards and only encodes the rest.
+# Runs share one checkpoint directory and resume by key: a restart uses every
+# checkpointed vector whose key is still missing, even if the catalog (or the
+# cache) changed in between. A checkpoint file is deleted once all of its keys
+# are in the cache, so concurrent runs neither clobber nor orphan each other's.
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DEFAULT_WORKERS = int(os.getenv("EMBEDDING_WORKERS", str(min(4, os.cpu_count() or 1))))
+DEFAULT_SHARD_SIZE = int(os.getenv("EMBEDDING_SHARD_SIZE", "2048"))
+BULK_ENCODE_MIN = int(os.getenv("BULK_ENCODE_MIN", "5000"))
+
+
+def _init_worker(threads):
+    # Split the cores between workers instead of every worker using all of them
+    os.environ["OMP_NUM_THREADS"] = str(threads)
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    from systems.embeddings import get_embedder
+    get_embedder()
+
+
+def _encode_shard(texts, keys, checkpoint_path, batch_size):
+    from systems.embeddings import get_embedder
+    vecs = np.asarray(get_embedder().encode(texts, batch_size=batch_size), dtype=np.float32)
+
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(checkpoint_path), suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, keys=np.array(keys, dtype="S40"), vecs=vecs)
+    os.replace(tmp_path, checkpoint_path)
+    return checkpoint_path, len(texts)
+
+
+def _load_checkpoints(checkpoint_dir, wanted):
+    """Checkpointed vectors of the keys in `wanted`, from every checkpoint file."""
+    done = {}
+    for path in glob.glob(os.path.join(checkpoint_dir, "*.npz")):
+        try:
+            with np.load(path) as f:
+                done.update((k, v) for k, v in zip(f["keys"].tolist(), f["vecs"]) if k in wanted)
+        except Exception:
+            print(f" Ignoring unreadable checkpoint {path}", file=sys.stderr)
+    return done
+
+
+def _drop_cached_checkpoints(checkpoint_dir, cache):
+    """Delete the checkpoint files whose keys are all in the cache."""
+    for path in glob.glob(os.path.join(checkpoint_dir, "*.npz")):
+        try:
+            with np.load(path) as f:
+                cached = all(k in cache.rows for k in f["keys"].tolist())
+            if cached:
+                os.remove(path)
+        except Exception:
+            continue  # unreadable, or removed by another run
+
+
+def bulk_index(texts, cache: EmbeddingCache, workers=DEFAULT_WORKERS, shard_size=DEFAULT_SHARD_SIZE,
+               checkpoint_dir=None, batch_size=64):
+    """
+    Encode every text missing from `cache` with a process pool and add the
+    vectors to the cache. Returns the number of newly encoded texts.
+    """
+    if checkpoint_dir is None:
+        checkpoint_dir = cache.path + ".checkpoints"
+
+    todo = cache.missing(texts)
+    if not todo:
+        return 0
+    os.makedirs(checkpoint_dir, exist_ok=True)
+
+    done = _load_checkpoints(checkpoint_dir, todo)
+    if done:
+        print(f"✅ Resuming: {len(done)} of {len(todo)} descriptions already checkpointed.", file=sys.stderr)
+    pending = sorted(((k, t) for k, t in todo.items() if k not in done), key=lambda kt: len(kt[1]))
+
+    shards = [pending[i:i + shard_size] for i in range(0, len(pending), shard_size)]
+    if shards:
+        workers = max(1, min(workers, len(shards)))
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        print(f" Encoding {len(pending)} descriptions in {len(shards)} shards on {workers} workers...", file=sys.stderr)
+        context = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(threads,)) as pool:
+            futures = []
+            for shard in shards:
+                keys = [k.decode("ascii") for k, _ in shard]
+                name = hashlib.sha1("".join(keys).encode("ascii")).hexdigest()
+                path = os.path.join(checkpoint_dir, f"{name}.npz")
+                futures.append(pool.submit(_encode_shard, [t for _, t in shard], keys, path, batch_size))
+            encoded = 0
+            for future in as_completed(futures):
+                path, count = future.result()
+                encoded += count
+                print(f" Shard done ({encoded}/{len(pending)})", file=sys.stderr)
+        done = _load_checkpoints(checkpoint_dir, todo)
+
+    # A key can be missing here only if another run cached it and dropped its
+    # checkpoint meanwhile; the cache has it, so nothing is lost
+    keys = [k for k in todo if k in done]
+    if keys:
+        cache.add(keys, np.stack([done[k] for k in keys]))
+
+    # Checkpoints whose vectors are all cached now have served their purpose
+    _drop_cached_checkpoints(checkpoint_dir, cache)
+    print(f"✅ Indexed {len(keys)} new product descriptions.", file=sys.stderr)
+    return len(keys)
+
+
+if __name__ == "__main__":
+    from systems.catalog_store import catalog_store
+    from systems.embeddings import embedding_model_id
+    from finder import ProductSearchModel
+
+    parser = argparse.ArgumentParser(description="Bulk-embed enterprise catalogs into the embedding cache")
+    parser.add_argument("enterprises", nargs="*", help="Enterprise codes (default: all)")
+    parser.add_argument("--cache-path", default="product_embeddings.npy")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    args = parser.parse_args()
+
+    prods = ProductSearchModel.get_product_list(catalog_store().get_enterprise_price_list(args.enterprises))
+    descs = [item["description"] for items in prods.values() for item in items]
+    cache = EmbeddingCache(args.cache_path, embedding_model_id())
+    bulk_index(descs, cache, workers=args.workers, shard_size=args.shard_size)
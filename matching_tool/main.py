@@ -4,7 +4,7 @@ import re
 import ast
 import sys
 import os
-from finder import ProductSearchModel
+from registry import MatcherRegistry
 import warnings
 import logging
 
@@ -22,11 +22,14 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from systems.llm_config import chunking
 from systems.train import train_data
 from systems.api_calls import api_calls
+from systems.catalog_store import catalog_store
 from logs.data_logging import data_logger
 
 api=api_calls()
+catalog=catalog_store(api=api)
 train=train_data()
 log=data_logger()
+matchers=MatcherRegistry()
 
 def normalize_description(text):
     return sorted(text.lower().strip().split())
@@ -86,10 +89,11 @@ def get_product_availability(enterprise_list, requirement):
     matches={ent:[] for ent in enterprise_list}
     not_available=[]
     try:
-      matcher = ProductSearchModel(api.get_enterprise_price_list(enterprise_list))
+      matcher = matchers.get(catalog.get_enterprise_price_list(enterprise_list))
 
-      for req in requirement:
-          matching=matcher.search(req['description'])
+      results = matcher.search_many([req['description'] for req in requirement])
+
+      for req, matching in zip(requirement, results):
           if matching['status'] == "available":
               matches[matching['enterprise']].append({matching['code']:req['description']})
           else:
@@ -107,7 +111,7 @@ def clean_description(text: str) -> str:
     text = re.sub(r'\s+', ' ', text).strip(' ,')
     return text
 def get_prods(enterprise_list):
-    data=api.get_enterprise_price_list(enterprise_list)
+    data=catalog.get_enterprise_price_list(enterprise_list)
     prods={}
 
     for edge in data.get("data", {}).get("getEnterpriseListing", {}).get("edges", []):
@@ -305,10 +309,10 @@ def match_enterprise_with_summary(requirement: list, rfp_id: str):
                 a.append({"code": node.get("code"), "description": node.get("description")})
 
             # summary retrieval
-            logs = log._load_logs()
-            if rfp_id not in logs:
+            rfp_log = log.get_rfp_data(rfp_id, tools=["summary"])
+            if not rfp_log:
                 return {"error": "❌ No logs found for that rfp_id."}
-            summary = logs[rfp_id]['tools']['summary']['result'].get('summary', '')
+            summary = rfp_log['tools']['summary']['result'].get('summary', '')
             if not summary:
                 return {"error": "❌ No summary provided for matching."}
 
@@ -327,7 +331,7 @@ def match_enterprise_with_summary(requirement: list, rfp_id: str):
 
 
             # Use chunking with the RFP summary as context (keeps your prior design)
-            t = chunking(clean_string(summary))
+            t = chunking(clean_string(summary), rfp_id=rfp_id, source="summary")
             result = t.invoke(
                 {"query": match_prompt},
                 config={
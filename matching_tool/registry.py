@@ -0,0 +1,63 @@
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+from finder import ProductSearchModel, EnterpriseShard
+
+# -------------------------
+# Warm shard registry
+# -------------------------
+# Building an EnterpriseShard fits TF-IDF, opens the embedding store / ANN
+# index and loads the feature table. The registry keeps built shards alive
+# across MCP tool calls, keyed by (enterprise, catalog version), and evicts
+# the least recently used ones once their estimated memory exceeds the budget.
+# Any shortlist of enterprises is then assembled from warm shards.
+
+DEFAULT_BUDGET_MB = int(os.getenv("MATCHER_CACHE_MB", "512"))
+
+
+def catalog_version(prods: dict) -> str:
+    """Stable hash of the parsed products, so any catalog edit yields a new key."""
+    h = hashlib.sha1()
+    for ent in sorted(prods):
+        for item in prods[ent]:
+            h.update(f"{ent}\0{item.get('code')}\0{item.get('description')}\0{item.get('category')}\0".encode("utf-8"))
+    return h.hexdigest()
+
+
+class MatcherRegistry:
+    def __init__(self, budget_mb=DEFAULT_BUDGET_MB, **shard_kwargs):
+        self.budget = budget_mb * 1024 * 1024
+        self.shard_kwargs = shard_kwargs
+        self._entries = OrderedDict()  # (enterprise, version) -> (shard, bytes)
+        self._lock = threading.Lock()
+
+    def get(self, price_list, **model_kwargs) -> ProductSearchModel:
+        return ProductSearchModel(price_list, shard_provider=self.shard, **model_kwargs)
+
+    def shard(self, enterprise, items) -> EnterpriseShard:
+        key = (enterprise, catalog_version({enterprise: items}))
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key][0]
+
+            shard = EnterpriseShard(enterprise, items, **self.shard_kwargs)
+            self._entries[key] = (shard, shard.memory_usage())
+            self._evict()
+            return shard
+
+    def _evict(self):
+        # The entry just added is last and is never evicted
+        while len(self._entries) > 1 and self.memory_usage() > self.budget:
+            self._entries.popitem(last=False)
+
+    def memory_usage(self):
+        return sum(size for _, size in self._entries.values())
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
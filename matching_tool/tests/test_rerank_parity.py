@@ -0,0 +1,89 @@
+import os
+import re
+import sys
+import numpy as np
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from finder import QueryFeatures, ProductFeatures, rerank_features, score_product
+
+# -------------------------
+# rerank_features vs score_product
+# -------------------------
+# rerank_features is the vectorized form of score_product over the feature
+# table; both must give the same score for every catalog row.
+
+CATALOG = {
+    "BLD": [
+        ("BLD-1", "Task Chair, Black Mesh Back", "Seating"),
+        ("BLD-2", "Conference Table 96W x 48D, Walnut", "Tables"),
+        ("BLD-3", "Coffee Table 48w x 24d Oak", "Tables"),
+        ("BLD-4", "Lateral File 3-Drawer 36W Grey", "Storage"),
+        ("BLD-5", "White Whiteboard 72 x 48", "Markerboards"),
+        ("BLD-6", "Reception Sofa, Brown Leather", "Lounge Seating"),
+    ],
+    "SCH": [
+        ("SCH-1", "Student Desk 24 x 18 Maple", "Classroom"),
+        ("SCH-2", "Stool 18H Black", "Classroom"),
+        ("SCH-3", "Bench 60W Natural", "Classroom"),
+        ("SCH-4", "Acoustic Felt Panel", "Classroom"),
+        ("SCH-5", "Small Brown Bookcase", "Classroom"),
+    ],
+    "CRA": [
+        ("CRA-1", "3-Seater Sofa Charcoal", None),
+        ("CRA-2", "Freestanding Partition 60H", None),
+        ("CRA-3", "Wall Paneling Profile", None),
+        ("CRA-4", "Monitor Arm", None),
+    ],
+}
+
+QUERIES = [
+    "task chair",                          # category + main type
+    "Conference table 96w x 48d",          # dimensions that match
+    "coffee table 30w x 30d",              # dimensions that do not match
+    "black stool for classroom",           # colour words skipped by the main-type fallback
+    "white small brown",                   # only colour words: empty main type
+    "monitor arm",                         # category "other"
+    "3-seater sofa in charcoal fabric",
+    "",                                    # empty query
+]
+
+
+@pytest.fixture(scope="module")
+def catalog():
+    prods = {ent: [{"code": c, "description": d, "category": cat} for c, d, cat in items]
+             for ent, items in CATALOG.items()}
+    codes = [(ent, c) for ent, items in CATALOG.items() for c, _, _ in items]
+    descs = [d for items in CATALOG.values() for _, d, _ in items]
+    return prods, codes, descs, ProductFeatures.build(descs, codes, prods)
+
+
+@pytest.mark.parametrize("query", QUERIES)
+def test_rerank_matches_score_product(catalog, query):
+    prods, codes, descs, features = catalog
+    rng = np.random.default_rng(len(query))
+    rows = rng.permutation(len(descs))
+    sims = rng.uniform(-1, 1, len(rows))
+
+    query_tokens = set(re.findall(r'\w+', query.lower()))
+    if not query_tokens:
+        # score_product divides by the token count; only the vectorized path takes empty queries
+        assert np.all(np.isfinite(rerank_features(QueryFeatures(query), features, rows, sims)))
+        return
+
+    expected = [
+        score_product(query, descs[r], prods[codes[r][0]][0].get("category"), sims[i], query_tokens)
+        for i, r in enumerate(rows)
+    ]
+    assert np.allclose(rerank_features(QueryFeatures(query), features, rows, sims), expected, atol=1e-6)
+
+
+def test_features_round_trip(catalog, tmp_path):
+    prods, codes, descs, features = catalog
+    path = str(tmp_path / "features.npz")
+    features.save(path)
+    loaded = ProductFeatures.load(path)
+    rows = np.arange(len(descs))
+    sims = np.linspace(-1, 1, len(rows))
+    qf = QueryFeatures("Conference table 96w x 48d")
+    assert np.allclose(rerank_features(qf, loaded, rows, sims), rerank_features(qf, features, rows, sims))
@@ -1,5 +1,4 @@
 from mcp.server.fastmcp import FastMCP
-import json
 import sys
 import os
 import warnings
@@ -25,6 +24,7 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from logs.data_logging import data_logger
 from views import template
 from systems.pdf_tools import html_to_pdf
+from systems.shared_files import update_json
 from systems.llm_config import proposal_change
 
 
@@ -74,7 +74,7 @@ async def display_proposal(rfp_id: str) -> str:
 
     try:
         # === Load JSON from logs ===
-        proposal_data = log._load_logs()[rfp_id]["tools"]["quotation"]["result"]["updated_result_json"]
+        proposal_data = log.get_rfp_data(rfp_id, tools=["quotation"])["tools"]["quotation"]["result"]["updated_result_json"]
 
         # === Render HTML ===
         proposal_html = template.render_proposal(
@@ -92,8 +92,7 @@ async def display_proposal(rfp_id: str) -> str:
     file_path = os.path.join(path, "html_content.json")
 
     content = {"rfp_id": rfp_id, "proposal_html": proposal_html['template'], "proposal_json": proposal_data}
-    with open(file_path, "w") as f:
-        json.dump(content, f, indent=4)
+    update_json(file_path, lambda json_data: json_data.update(content))
 
     # === Preview in browser ===
     try:
@@ -246,16 +245,14 @@ def extract_sections(soup):
             sections.append({"heading": heading_text, "content": nxt, "html": str(nxt)})
     return sections
 
-@mcp.tool(description="""after creating proposal when user ask to make chaneges in the proposal call this tool with rfp_id and user query
-        user_queries is a list of strings containing the changes to be made in the proposal""")
-def make_changes_in_proposal(rfp_id: str, user_queries: list) -> str:
+def _make_changes_in_proposal(rfp_id: str, user_queries: list) -> str:
     """
     For each query: locate the whole container block (div/section) for the section named
     in the prompt, send that block + prompt to LLM, get updated block back, replace it
     in the original HTML, and print the final HTML at the end.
     """
     # load current proposal HTML from logs (same as your original)
-    result = log._load_logs()[rfp_id]["tools"]["proposal"]["result"]
+    result = log.get_rfp_data(rfp_id, tools=["proposal"])["tools"]["proposal"]["result"]
     html_content = result["updated_proposal_html"]
 
     for user_query in user_queries:
@@ -376,7 +373,15 @@ def make_changes_in_proposal(rfp_id: str, user_queries: list) -> str:
     # Print the full updated HTML (as you requested)
 
     return "finished"
-    
+
+@mcp.tool(description="""after creating proposal when user ask to make chaneges in the proposal call this tool with rfp_id and user query
+        user_queries is a list of strings containing the changes to be made in the proposal""")
+def make_changes_in_proposal(rfp_id: str, user_queries: list) -> str:
+    # Hold the RFP lock from reading the proposal to saving it, so edits
+    # running in parallel apply one after the other instead of overwriting each other
+    with log.lock(rfp_id):
+        return _make_changes_in_proposal(rfp_id, user_queries)
+
 # ===== START SERVER =====
 if __name__ == "__main__":
     try:
@@ -11,7 +11,7 @@ from typing import Dict, List, Any
 from rapidfuzz import fuzz
 import warnings
 import logging
-import time
+import asyncio
 
 # Silence noisy logs
 os.environ["TF_CPP_MIN_LOG_LEVEL"] = "3"
@@ -24,16 +24,21 @@ logging.getLogger("chromadb").setLevel(logging.ERROR)
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from views import template
 from systems.api_calls import api_calls
+from systems.catalog_store import catalog_store
 from logs.data_logging import data_logger
 from systems.llm_config import llm
+from systems.shared_files import update_json
 from systems.pdf_tools import html_to_pdf
 
 # Load from parent .env
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
 price_list_url = os.getenv("ENTERPRISE_PRISE_GRAPHQL_URL")
+QUOTATION_CONCURRENCY = int(os.getenv("QUOTATION_CONCURRENCY", "4"))
+EDIT_EXTRACTION_CONCURRENCY = int(os.getenv("EDIT_EXTRACTION_CONCURRENCY", "8"))
 
 mcp = FastMCP("create quotation")
 api = api_calls()
+catalog = catalog_store(api=api)
 log = data_logger()
 
 
@@ -51,29 +56,38 @@ def get_html_content_path() -> str:
     return os.path.join(tempfile.gettempdir(), "html_content.json")
 
 
-def filter_catalog_by_similarity(catalog: dict, requirements: List[str]) -> List[Dict[str, Any]]:
-    """Filter enterprise catalog for matched product codes."""
-    lst = (
-        catalog.get("data", {})
-        .get("getEnterpriseListing", {})
-        .get("edges", [])[0]
-        .get("node", {})
-        .get("children", [])[0]
-        .get("children", [])
-    )
-    for section in lst:
-        if section.get("key") == "Product":
-            catalog = section.get("children", [])
+def filter_catalog_by_similarity(catalog: dict, requirements: List[str], enterprise_code: str = None) -> List[Dict[str, Any]]:
+    """Filter enterprise catalog for matched product codes.
+
+    `catalog` may hold several enterprises (one batched price-list query);
+    `enterprise_code` picks the enterprise's own edge. Without it the first
+    edge is used; if the enterprise is not in the catalog nothing matches, so
+    its quotation is never priced from another enterprise's catalog.
+    """
+    edges = catalog.get("data", {}).get("getEnterpriseListing", {}).get("edges", [])
+    if enterprise_code is None:
+        node = edges[0].get("node", {}) if edges else {}
+    else:
+        node = next((e.get("node", {}) for e in edges if e.get("node", {}).get("code") == enterprise_code), None)
+        if node is None:
+            print(f"❌ No price list for {enterprise_code}; no products priced.", file=sys.stderr)
+            return []
+    products = {}
+    for child in node.get("children", []):
+        for section in child.get("children", []):
+            if section.get("key") == "Product":
+                for item in section.get("children", []):
+                    products.setdefault(item.get("code"), item)
+
     matched_products = []
     for req in requirements:
-        for item in catalog:
-            if item["code"] == req:
-                matched_products.append({
-                    "code": item.get("code"),
-                    "description": item.get("description"),
-                    "unit_price": item.get("BasePrice", [{}])[0].get("price", 0)
-                })
-                break
+        item = products.get(req)
+        if item:
+            matched_products.append({
+                "code": item.get("code"),
+                "description": item.get("description"),
+                "unit_price": item.get("BasePrice", [{}])[0].get("price", 0)
+            })
     return matched_products
 
 def extract_field_and_value(query: str):
@@ -228,6 +242,86 @@ def update_value(data: dict, field: str, context: str, value, mode: str):
 
     return data
 
+class TemplateRenderError(Exception):
+    pass
+
+
+async def create_enterprise_quotation(rfp_id, code, product_details, price_lists, enterprise_node,
+                                      client_information, project_timeline, due_date, issue_date):
+    """Build, render and print the quotation of one enterprise; returns (html, quotation json)."""
+    # === STEP 2: Filter catalog ===
+    matched_codes = [prod['product_code'] for prod in product_details]
+    filtered_catalog = filter_catalog_by_similarity(price_lists, matched_codes, code)
+
+    # === STEP 3: Prepare base quotation JSON ===
+    quotation = {
+        "Client Information": {
+            "Company": "IOM Washington DC New Office Furniture, Electrical and Networking Services",
+            "Location": "United States",  # simple extraction; could parse further from RFP
+            **client_information
+        },
+        "Enterprise Information": {
+            "contactName": "",
+            "email": "",
+            "name": "",
+            "description":"",
+            "address": "",
+            "phoneNumber": "",
+            "website": "",
+            "code":""
+        },
+        "Quotation Details": {
+            "Date": datetime.today().strftime("%B %d, %Y"),
+            "Due Date": due_date,
+            "Quotation ID": generate_quote_id(code),
+            "Contact": "",
+            "Issue date": issue_date
+        },
+        "furniture_items_and_pricing": [],
+        "project_timeline": project_timeline
+    }
+
+    # === STEP 4: Merge products (loop instead of LLM) ===
+    for req in product_details:
+        req_code = req["product_code"]
+        req_qty = req["qty"]
+
+        # find product info in filtered catalog
+        product_info = next((p for p in filtered_catalog if p["code"] == req_code), None)
+        if not product_info:
+            continue
+
+        unit_price = product_info.get("unit_price", 0.0)
+        total_amount = req_qty * unit_price
+
+        quotation["furniture_items_and_pricing"].append({
+            "product code": req_code,
+            "RFP_description": req['description'],
+            "description":product_info.get("description"),
+            "quantity": req_qty,
+            "unit price": unit_price,
+            "total amount": total_amount
+        })
+
+    # === STEP 5: Fill Enterprise Information ===
+    for field in ["contactName", "code", "email", "name", "address", "phoneNumber", "website","description"]:
+        quotation["Enterprise Information"][field] = enterprise_node.get(field, "")
+
+    # === STEP 6: Render HTML, then print both PDFs at once ===
+    try:
+        today = date.today().strftime("%m/%d/%Y")
+        temp_html = template.render_quotation(quotation, today=today)
+        ent_temp_html = template.render_quotation_for_enterprise(quotation, today=today)
+        names = quotation["Enterprise Information"]["code"]
+        await asyncio.gather(
+            html_to_pdf(temp_html, rfp_id, f"{names}.pdf"),
+            html_to_pdf(ent_temp_html, rfp_id, f"{names}_ent.pdf"),
+        )
+    except Exception as render_err:
+        raise TemplateRenderError(render_err) from render_err
+
+    return temp_html, quotation
+
 @mcp.tool(description="""
 When user ask for prepare quoatation or RFQ or Request For Quotation for manufacturers
 
@@ -263,125 +357,57 @@ async def create_quotation_for_the_document(
         except Exception:
             return "❌ Invalid enterprise_availability_list format."
 
+    codes = [code for code, product_details in enterprise_availability_list.items() if product_details]
+    client_information = {
+        "RFP Number": rfp_number,
+        "Name": contact_person,
+        "Address": client_address,
+        "email": client_email,
+        "phone": client_phone,
+        "fax": client_fax
+    }
+
+    if not codes:
+        return "❌ No matched products in enterprise_availability_list."
+
+    # === STEP 1: Fetch every enterprise's catalog and details up front, in one query each ===
+    price_lists, enterprise_data = await asyncio.gather(
+        asyncio.to_thread(catalog.get_enterprise_price_list, codes),
+        asyncio.to_thread(api.get_enterprise_list, codes),
+    )
+    enterprise_nodes = {
+        edge.get("node", {}).get("code"): edge.get("node", {})
+        for edge in enterprise_data.get("data", {}).get("getEnterpriseListing", {}).get("edges", [])
+    }
+
+    # === STEPS 2-6 run concurrently per enterprise ===
+    semaphore = asyncio.Semaphore(QUOTATION_CONCURRENCY)
+
+    async def run(code):
+        async with semaphore:
+            return await create_enterprise_quotation(
+                rfp_id, code, enterprise_availability_list[code], price_lists,
+                enterprise_nodes.get(code, {}), client_information, project_timeline, due_date, issue_date,
+            )
+
+    results = await asyncio.gather(*(run(code) for code in codes), return_exceptions=True)
+
     quotation_template = {}
     quotation_json = {}
-    proposal_template = {}
-    proposal_json = {}
-
-    for code, product_details in enterprise_availability_list.items():
-        if not product_details:
+    for code, result in zip(codes, results):
+        if isinstance(result, TemplateRenderError):
+            return f"❌ Template rendering failed: {result}"
+        if isinstance(result, Exception):
+            print(f" Error creating quotation for {code}: {result}", file=sys.stderr)
             continue
+        quotation_template[code], quotation_json[code] = result
 
-        try:
-            # === STEP 1: Get product catalog ===
-            product_dict = api.get_enterprise_price_list([code])
-
-            # === STEP 2: Filter catalog ===
-            matched_codes = [prod['product_code'] for prod in product_details]
-            filtered_catalog = filter_catalog_by_similarity(product_dict, matched_codes)
-
-            # === STEP 3: Prepare base quotation JSON ===
-            quotation = {
-                "Client Information": {
-                    "Company": "IOM Washington DC New Office Furniture, Electrical and Networking Services",
-                    "Location": "United States",  # simple extraction; could parse further from RFP
-                    "RFP Number": rfp_number,
-                    "Name": contact_person,
-                    "Address": client_address,
-                    "email": client_email,
-                    "phone":client_phone,
-                    "fax":client_fax
-
-                },
-                "Enterprise Information": {
-                    "contactName": "",
-                    "email": "",
-                    "name": "",
-                    "description":"",
-                    "address": "",
-                    "phoneNumber": "",
-                    "website": "",
-                    "code":""
-                },
-                "Quotation Details": {
-                    "Date": datetime.today().strftime("%B %d, %Y"),
-                    "Due Date": due_date,
-                    "Quotation ID": generate_quote_id(code),
-                    "Contact": "",
-                    "Issue date": issue_date
-                },
-                "furniture_items_and_pricing": [],
-                "project_timeline": project_timeline
-            }
-
-            # === STEP 4: Merge products (loop instead of LLM) ===
-            for req in product_details:
-                req_code = req["product_code"]
-                req_qty = req["qty"]
-
-                # find product info in filtered catalog
-                product_info = next((p for p in filtered_catalog if p["code"] == req_code), None)
-                if not product_info:
-                    continue
-
-                unit_price = product_info.get("unit_price", 0.0)
-                total_amount = req_qty * unit_price
-
-                quotation["furniture_items_and_pricing"].append({
-                    "product code": req_code,
-                    "RFP_description": req['description'],
-                    "description":product_info.get("description"),
-                    "quantity": req_qty,
-                    "unit price": unit_price,
-                    "total amount": total_amount
-                })
-
-            # === STEP 5: Fill Enterprise Information ===
-            enterprise_data = api.get_enterprise_list([code])
-            node = (
-                enterprise_data.get("data", {})
-                .get("getEnterpriseListing", {})
-                .get("edges", [{}])[0]
-                .get("node", {})
-            )
-
-            for field in ["contactName", "code", "email", "name", "address", "phoneNumber", "website","description"]:
-                quotation["Enterprise Information"][field] = node.get(field, "")
-
-            # === STEP 6: Render HTML ===
-            try:
-                temp_html = template.render_quotation(quotation, today=date.today().strftime("%m/%d/%Y"))
-                names = quotation["Enterprise Information"]["code"]
-                await html_to_pdf(temp_html, rfp_id, f"{names}.pdf")
-                
-                ent_temp_html = template.render_quotation_for_enterprise(quotation, today=date.today().strftime("%m/%d/%Y"))
-                ent_names = quotation["Enterprise Information"]["code"]
-                await html_to_pdf(ent_temp_html, rfp_id, f"{ent_names}_ent.pdf")
-            except Exception as render_err:
-                return f"❌ Template rendering failed: {render_err}"
-
-            quotation_template[code] = temp_html
-            quotation_json[code] = quotation
-            
-            
-
-        except Exception as e:
-            print(f" Error creating quotation for {code}: {e}")
-    
     # === STEP 7: Save to shared html_content.json ===
     path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
     file_path = os.path.join(path, "html_content.json")
-    if os.path.exists(file_path):
-        with open(file_path, "r") as f:
-            json_data = json.load(f)
-    else:
-        json_data = {}
-
-    json_data["quotation"] = quotation_template
-    json_data["updated_quotation"] = quotation_template
-
-    with open(file_path, "w") as f:
-        json.dump(json_data, f, indent=4)
+    update_json(file_path, lambda json_data: json_data.update(
+        quotation=quotation_template, updated_quotation=quotation_template
+    ))
 
     # === STEP 8: Preview in browser ===
     for enterprise_code, html_str in quotation_template.items():
@@ -397,9 +423,9 @@ async def create_quotation_for_the_document(
             if enterprise_code not in create_quotation_for_the_document.opened:
                 webbrowser.open(f"file://{temp_path}")
                 create_quotation_for_the_document.opened[enterprise_code] = True
-            time.sleep(2)
+                await asyncio.sleep(2)
         except Exception as e:
-            print(f" Preview failed for {enterprise_code}: {e}")
+            print(f" Preview failed for {enterprise_code}: {e}", file=sys.stderr)
 
     # === STEP 9: Logging ===
     try:
@@ -411,7 +437,7 @@ async def create_quotation_for_the_document(
         })
 
     except Exception as log_err:
-        print(f"Logging failed: {log_err}")
+        print(f"Logging failed: {log_err}", file=sys.stderr)
 
     # ✅ Return immediately
     message = "✅ Quotation created successfully for all enterprises."
@@ -425,6 +451,93 @@ def save_updated_html(rfp_id, html_content,enterprise_code):
         f.write(html_content)
     return quotation_temp_path
 
+def apply_quotation_edit(quotation_json: dict, field, context, new_value, mode) -> dict:
+    """Apply one extracted edit to a quotation JSON in place and return it."""
+    # Normalize field key (case-insensitive match)
+    field_key = next((k for k in quotation_json.keys() if k.lower() == field.lower()), None)
+
+    # Handle REMOVE separately
+    if mode == "REMOVE":
+        if field.lower() == "product":
+            quotation_json["furniture_items_and_pricing"] = [
+                item for item in quotation_json["furniture_items_and_pricing"]
+                if not (item.get("product code") == context or item.get("description") == context)
+            ]
+        elif field_key and isinstance(quotation_json[field_key], list):
+            target_list = quotation_json[field_key]
+            if isinstance(context, int) and 0 <= context < len(target_list):
+                target_list.pop(context-1)
+            elif isinstance(context, str):
+                if context.lower() == "last" and target_list:
+                    target_list.pop()
+                else:
+                    # Remove by content match
+                    quotation_json[field_key] = [
+                        item for item in target_list if context not in str(item)
+                    ]
+
+    else:
+        # Find path
+        path, value = find_update_path_in_json(quotation_json, field, context, new_value)
+        if path is None:
+            raise ValueError(f"❌ Could not locate field '{field}' with context '{context}' in quotation JSON")
+
+        # Traverse to parent
+        parent = quotation_json
+        for p in path[:-1]:
+            parent = parent[p]
+        key = path[-1]
+        current_val = parent[key]
+
+        # Handle list fields
+        if isinstance(current_val, list):
+            if mode == "ADD":
+                current_val.append(new_value)
+            elif mode == "SET":
+                if isinstance(context, int) and context < len(current_val):
+                    current_val[context] = new_value
+                elif isinstance(context, str) and context == "last":
+                    current_val[-1] = new_value
+                else:
+                    current_val = [new_value]  # overwrite whole list
+                parent[key] = current_val
+
+        # Handle numeric fields
+        elif isinstance(current_val, (int, float)):
+            if mode == "ADD":
+                parent[key] = current_val + new_value
+            elif mode == "SUBTRACT":
+                parent[key] = current_val - new_value
+            else:  # SET
+                parent[key] = new_value
+
+        # Handle string fields
+        elif isinstance(current_val, str):
+            if mode == "ADD":
+                parent[key] = current_val + " " + str(new_value)
+            else:  # SET
+                parent[key] = str(new_value)
+
+        # Handle list fields again (safety net)
+        elif isinstance(current_val, list):
+            if mode == "ADD":
+                if new_value is None:
+                    raise ValueError(f"❌ Cannot ADD None to list field {field}")
+                current_val.append(new_value)
+            elif mode == "SET":
+                if context is None:
+                    parent[key] = [new_value]  # overwrite whole list
+                elif isinstance(context, int) and context < len(current_val):
+                    current_val[context] = new_value
+                elif context == "last":
+                    current_val[-1] = new_value
+
+        else:
+            raise ValueError(f"❌ Unsupported field type: {type(current_val)} for field {field}")
+
+    return quotation_json
+
+
 @mcp.tool(description="""
 This tool is called whenever the user asks to make changes in the quotation created.
 
@@ -434,125 +547,49 @@ This tool is called whenever the user asks to make changes in the quotation crea
 - the queries must in this structure {'enterprise_code': ['query1','query2']}
 """)
 async def make_changes_in_quotation(rfp_id: str, queries: dict):
-
-    for enterprise_code,query in queries.items():
-        for q in query:
-            quotation_log = log._load_logs()
-            data_json = quotation_log[rfp_id]['tools']['quotation']['result']
-            quotation_json = data_json['updated_result_json'][enterprise_code]
-
-            # Extract update
-            field, context, new_value, mode = extract_field_and_value(q)
-            print(field, context, new_value, mode)
-
-            # Normalize field key (case-insensitive match)
-            field_key = next((k for k in quotation_json.keys() if k.lower() == field.lower()), None)
-
-            # Handle REMOVE separately
-            if mode == "REMOVE":
-                if field.lower() == "product":
-                    quotation_json["furniture_items_and_pricing"] = [
-                        item for item in quotation_json["furniture_items_and_pricing"]
-                        if not (item.get("product code") == context or item.get("description") == context)
-                    ]
-                elif field_key and isinstance(quotation_json[field_key], list):
-                    target_list = quotation_json[field_key]
-                    if isinstance(context, int) and 0 <= context < len(target_list):
-                        target_list.pop(context-1)
-                    elif isinstance(context, str):
-                        if context.lower() == "last" and target_list:
-                            target_list.pop()
-                        else:
-                            # Remove by content match
-                            quotation_json[field_key] = [
-                                item for item in target_list if context not in str(item)
-                            ]
-                updated_data = quotation_json
-
-            else:
-                # Find path
-                path, value = find_update_path_in_json(quotation_json, field, context, new_value)
-                if path is None:
-                    raise ValueError(f"❌ Could not locate field '{field}' with context '{context}' in quotation JSON")
-
-                # Traverse to parent
-                parent = quotation_json
-                for p in path[:-1]:
-                    parent = parent[p]
-                key = path[-1]
-                current_val = parent[key]
-
-                # Handle list fields
-                if isinstance(current_val, list):
-                    if mode == "ADD":
-                        current_val.append(new_value)
-                    elif mode == "SET":
-                        if isinstance(context, int) and context < len(current_val):
-                            current_val[context] = new_value
-                        elif isinstance(context, str) and context == "last":
-                            current_val[-1] = new_value
-                        else:
-                            current_val = [new_value]  # overwrite whole list
-                        parent[key] = current_val
-                    updated_data = quotation_json
-
-                # Handle numeric fields
-                elif isinstance(current_val, (int, float)):
-                    if mode == "ADD":
-                        parent[key] = current_val + new_value
-                    elif mode == "SUBTRACT":
-                        parent[key] = current_val - new_value
-                    else:  # SET
-                        parent[key] = new_value
-                    updated_data = quotation_json
-
-                # Handle string fields
-                elif isinstance(current_val, str):
-                    if mode == "ADD":
-                        parent[key] = current_val + " " + str(new_value)
-                    else:  # SET
-                        parent[key] = str(new_value)
-                    updated_data = quotation_json
-
-                # Handle list fields again (safety net)
-                elif isinstance(current_val, list):
-                    if mode == "ADD":
-                        if new_value is None:
-                            raise ValueError(f"❌ Cannot ADD None to list field {field}")
-                        current_val.append(new_value)
-                    elif mode == "SET":
-                        if context is None:
-                            parent[key] = [new_value]  # overwrite whole list
-                        elif isinstance(context, int) and context < len(current_val):
-                            current_val[context] = new_value
-                        elif context == "last":
-                            current_val[-1] = new_value
-
-                else:
-                    raise ValueError(f"❌ Unsupported field type: {type(current_val)} for field {field}")
-
-            # Re-render HTML
-            updated_html = template.render_quotation(updated_data,today=date.today().strftime("%m/%d/%Y"))
-            names=updated_data["Enterprise Information"]["code"]
-            await html_to_pdf(updated_html,rfp_id,f"{names}.pdf")
-
-            # Save updated JSON + HTML
-                # Save updated JSON + HTML for quotation
-            data_json['updated_result_json'][enterprise_code] = updated_data
-            data_json['updated_quotation'][enterprise_code] = updated_html
-            log.log_quotation(rfp_id, data_json)
-
-            save_updated_html(rfp_id, updated_html,enterprise_code)
-
-
+    # Extract every edit first (LLM calls run concurrently), so a query that
+    # cannot be parsed or applied leaves the quotation untouched
+    semaphore = asyncio.Semaphore(EDIT_EXTRACTION_CONCURRENCY)
+
+    async def extract(q):
+        async with semaphore:
+            return await asyncio.to_thread(extract_field_and_value, q)
+
+    flat = [(enterprise_code, q) for enterprise_code, query in queries.items() for q in query]
+    extracted = await asyncio.gather(*(extract(q) for _, q in flat))
+
+    # Apply all edits in order to the latest stored quotation and re-render
+    # once per enterprise, in one log transaction so that concurrent edits
+    # from other processes are not overwritten
+    today = date.today().strftime("%m/%d/%Y")
+    rendered = {}
+
+    def apply_edits(data_json):
+        for (enterprise_code, q), (field, context, new_value, mode) in zip(flat, extracted):
+            apply_quotation_edit(data_json['updated_result_json'][enterprise_code], field, context, new_value, mode)
+        for enterprise_code in dict.fromkeys(code for code, _ in flat):
+            rendered[enterprise_code] = template.render_quotation(data_json['updated_result_json'][enterprise_code], today=today)
+            data_json['updated_quotation'][enterprise_code] = rendered[enterprise_code]
+        return data_json
+
+    if not flat:
+        return "✅ Quotation updated successfully."
+    data_json = await asyncio.to_thread(log.update_tool, rfp_id, "quotation", apply_edits)
+
+    # Print once per enterprise
+    await asyncio.gather(*(
+        html_to_pdf(html, rfp_id, f"{data_json['updated_result_json'][code]['Enterprise Information']['code']}.pdf")
+        for code, html in rendered.items()
+    ))
+    for enterprise_code, updated_html in rendered.items():
+        save_updated_html(rfp_id, updated_html, enterprise_code)
 
     return "✅ Quotation updated successfully."
 
 # ===== START SERVER =====
 if __name__ == "__main__":
-    import asyncio
     try:
-        print("✅ Starting MCP Server...")
+        print("✅ Starting MCP Server...", file=sys.stderr)
         mcp.run()
 #         print(asyncio.run(make_changes_in_quotation(rfp_id= '474c5d7aafd4aa6da6ad0a948a98c615c8f20581593c64ff607aa000f4d02735',
 #   queries= {
@@ -564,5 +601,5 @@ if __name__ == "__main__":
         # print(asyncio.run(display_proposal(rfp_id='474c5d7aafd4aa6da6ad0a948a98c615c8f20581593c64ff607aa000f4d02735')))
         
     except Exception as ex:
-        print(f"❌ MCP Server failed: {str(ex)}")
+        print(f"❌ MCP Server failed: {str(ex)}", file=sys.stderr)
         
\ No newline at end of file
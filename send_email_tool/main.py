@@ -177,8 +177,8 @@ def prepare_email(to_email, subject, message, pdf_bytes=None, html_pdf_bytes=Non
 @mcp.tool(description="Submit final quotation synchronously (single email with merged PDFs)")
 async def Submit_the_final_quotation(rfp_id: str, email_address: str):
     try:
-        logs_data = log._load_logs()
-        quotation_keys = logs_data[rfp_id]["tools"]["quotation"]["result"]["updated_quotation"]
+        rfp_log = log.get_rfp_data(rfp_id, tools=["quotation", "matching", "proposal"])
+        quotation_keys = rfp_log["tools"]["quotation"]["result"]["updated_quotation"]
         enterprise_list = list(quotation_keys.keys())
         if not enterprise_list:
             return "❌ No quotations found."
@@ -193,7 +193,7 @@ async def Submit_the_final_quotation(rfp_id: str, email_address: str):
                 cutsheet = api.get_enterprise_cutsheet([enterprise])
                 products = [
                     list(codes.keys())[0]
-                    for codes in logs_data[rfp_id]["tools"]["matching"]["result"]["availability"][enterprise]
+                    for codes in rfp_log["tools"]["matching"]["result"]["availability"][enterprise]
                 ]
                 
                 merged_cutsheet_bytes = await get_cutsheet_optimized(cutsheet, products)
@@ -206,7 +206,7 @@ async def Submit_the_final_quotation(rfp_id: str, email_address: str):
                     errors.append(f"❌ Quotation not created for {enterprise}")
                     continue
 
-                json_data = logs_data[rfp_id]["tools"]["quotation"]["result"]["updated_result_json"][enterprise]
+                json_data = rfp_log["tools"]["quotation"]["result"]["updated_result_json"][enterprise]
                 last_json_data = json_data  
 
                 filename = f"{enterprise}.pdf"
@@ -227,7 +227,7 @@ async def Submit_the_final_quotation(rfp_id: str, email_address: str):
         merged_proposal = merge_pdfs_streaming(proposal_pdfs) if proposal_pdfs else None
 
         # ====== Contacts ======
-        contacts_info = logs_data[rfp_id]["tools"]["proposal"]["result"]["json_data"][enterprise]["Dealer Information"]
+        contacts_info = rfp_log["tools"]["proposal"]["result"]["json_data"][enterprise]["Dealer Information"]
 
         phone = contacts_info.get("phone")
         email = contacts_info.get("email")
@@ -284,13 +284,12 @@ Sincerely,
 @mcp.tool(description="send email to enterprise when user ask to send request for quotation to enterprises.")
 async def send_request_for_quotation_email_to_enterprise(rfp_id: str):
     try:
-        logs_data = log._load_logs()
-        quotation_keys = logs_data[rfp_id]["tools"]["quotation"]["result"]["updated_quotation"]
+        rfp_log = log.get_rfp_data(rfp_id, tools=["quotation", "proposal"])
+        quotation_keys = rfp_log["tools"]["quotation"]["result"]["updated_quotation"]
         enterprise_list = list(quotation_keys.keys())
         if not enterprise_list:
             return "❌ No quotations found."
 
-        logs = logs_data
         executor = ProcessPoolExecutor()
 
         email_msgs = []
@@ -305,14 +304,14 @@ async def send_request_for_quotation_email_to_enterprise(rfp_id: str):
                     merged_pdf_bytes = merge_pdfs(pdf_bytes_list)
 
                 email_html = quotation_keys.get(enterprise)
-                json_data = logs[rfp_id]["tools"]["quotation"]["result"]["updated_result_json"][enterprise]
+                json_data = rfp_log["tools"]["quotation"]["result"]["updated_result_json"][enterprise]
                 if not email_html:
                     errors.append(f"❌ Quotation not created for {enterprise}")
                     continue
 
                 filename = f"{json_data['Enterprise Information']['code']}_ent.pdf"
                 html_pdf_bytes = pdf_to_bytes(rfp_id, filename)
-                contacts_info = logs_data[rfp_id]["tools"]["proposal"]["result"]["json_data"][enterprise]["Dealer Information"]
+                contacts_info = rfp_log["tools"]["proposal"]["result"]["json_data"][enterprise]["Dealer Information"]
 
                 message = f"""Dear {json_data["Enterprise Information"]["contactName"]},
 
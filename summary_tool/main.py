@@ -2,6 +2,7 @@
 import os
 import sys
 import json
+import hashlib
 import warnings
 import logging
 from typing import Optional, Dict, Any
@@ -24,8 +25,9 @@ mcp = FastMCP("summarize the pdf")
 # add root path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from systems.llm_config import chunking
+from systems.llm_config import chunking, model as llm_model
 from logs.data_logging import data_logger
+from systems.shared_files import update_json
 
 log = data_logger()
 
@@ -66,6 +68,55 @@ def save_cache(cache_list):
     with open(path, "w") as f:
         json.dump({"names": cache_list}, f, indent=2)
 
+# Summary cache: the summary of a document is reused while the normalized
+# content, the summarization prompt and the LLM model are all unchanged, so a
+# re-upload or retry skips chunking/embedding and the map-reduce LLM calls.
+SUMMARIZATION_PROMPT = """
+Analyze the furniture RFP and return ONLY valid JSON:
+
+{
+  "executive_summary": "5–7 sentences covering project background, scope, objectives, key dates, requirements, and evaluation approach.",
+  "important_dates": [],
+  "evaluation_criteria": [],
+  "financial_terms": {},
+  "contact_info": [],
+  "furniture_requirements": [],
+  "other_requirements": {}
+}
+
+Rules:
+- Only include fields present in the RFP; else leave empty.
+- Executive summary must be a full paragraph, not less than 5 sentences.
+- Dates → "Month DD, YYYY".
+- Be concise and factual, no extra text outside JSON.
+"""
+SUMMARY_PROMPT_VERSION = hashlib.sha256(SUMMARIZATION_PROMPT.encode("utf-8")).hexdigest()[:12]
+SUMMARY_CACHE_FILE = "summary_cache.json"
+SUMMARY_CACHE_MAX = int(os.getenv("SUMMARY_CACHE_MAX", "500"))
+
+def summary_cache_key(content: str) -> str:
+    normalized = " ".join(content.split())
+    content_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    return f"{content_hash}:{SUMMARY_PROMPT_VERSION}:{llm_model}"
+
+def _summary_cache_path():
+    return os.path.join(os.path.dirname(__file__), SUMMARY_CACHE_FILE)
+
+def load_cached_summary(key: str):
+    try:
+        with open(_summary_cache_path(), "r") as f:
+            return json.load(f).get(key)
+    except (FileNotFoundError, ValueError):
+        return None
+
+def save_cached_summary(key: str, summary: str, rfp_id: str):
+    def add(cache):
+        cache[key] = {"summary": summary, "rfp_id": rfp_id, "created_at": datetime.now().isoformat()}
+        # Keep the newest SUMMARY_CACHE_MAX entries
+        for old in sorted(cache, key=lambda k: cache[k]["created_at"])[:max(0, len(cache) - SUMMARY_CACHE_MAX)]:
+            del cache[old]
+    update_json(_summary_cache_path(), add)
+
 def normalize_org_name(input_name: str) -> str:
     # Simulating your cache
     cache = load_cache()
@@ -119,58 +170,44 @@ def summarize_pdf_content(
         path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
         file_path = os.path.join(path, "html_content.json")
 
-        if os.path.exists(file_path):
-            with open(file_path, "r") as f:
-                json_data = json.load(f)
-        else:
-            json_data = {}
-
-        # Initialize placeholders for later stages
-        json_data.setdefault("quotation", {})
-        json_data.setdefault("cutsheet", {})
-
-        with open(file_path, "w") as f:
-            json.dump(json_data, f, indent=4)
+        def init_placeholders(json_data):
+            # Initialize placeholders for later stages
+            json_data.setdefault("quotation", {})
+            json_data.setdefault("cutsheet", {})
 
-        # Prompt for summarization
-        summarization_prompt = """
-Analyze the furniture RFP and return ONLY valid JSON:
-
-{
-  "executive_summary": "5–7 sentences covering project background, scope, objectives, key dates, requirements, and evaluation approach.",
-  "important_dates": [],
-  "evaluation_criteria": [],
-  "financial_terms": {},
-  "contact_info": [],
-  "furniture_requirements": [],
-  "other_requirements": {}
-}
+        update_json(file_path, init_placeholders)
 
-Rules:
-- Only include fields present in the RFP; else leave empty.
-- Executive summary must be a full paragraph, not less than 5 sentences.
-- Dates → "Month DD, YYYY".
-- Be concise and factual, no extra text outside JSON.
-"""
+        issue_date = normalize_date(issue_date) or ""
+        client_name = normalize_org_name(client_name) or ""
+        rfp_id = log._generate_doc_id(rfp_number or "", issue_date, client_name)
 
-        # Run through LLM with chunking
-        t = chunking(content)
-        result = t.invoke({"query": summarization_prompt})
-        summary = result.get("result", "")
-        
+        # Reuse the summary of identical content, else run through LLM with chunking
+        cache_key = summary_cache_key(content)
+        cached = load_cached_summary(cache_key)
+        if cached:
+            print(f"✅ Summary cache hit for {document_name}", file=sys.stderr)
+            summary = cached["summary"]
+        else:
+            # Chunks are stored per RFP, for later questions on the document too
+            t = chunking(content, rfp_id=rfp_id, source="document")
+            result = t.invoke({"query": SUMMARIZATION_PROMPT})
+            summary = result.get("result", "")
 
         # Log extracted summary with raw text
         rfp_id = log.log_rfp(
             document_name=document_name,
             rfp_number=rfp_number or "",
-            issue_date=normalize_date(issue_date) or "",
-            client_name=normalize_org_name(client_name) or "",
+            issue_date=issue_date,
+            client_name=client_name,
             extracted_data={
                 "summary": summary,
                 "raw_text": content
             }
         )
 
+        if not cached and summary:
+            save_cached_summary(cache_key, summary, rfp_id)
+
         return {
             "rfp_id": rfp_id,
             "summary": summary
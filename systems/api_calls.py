@@ -1,10 +1,10 @@
 from dotenv import load_dotenv
-import requests
 import sys
 import os
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+from systems.http_client import post_json
 
 class api_calls:
     def __init__(self):
@@ -12,7 +12,7 @@ class api_calls:
         self.url = os.getenv("ENTERPRISE_GRAPHQL_URL")
         self.api_key = os.getenv("ENTERPRISE_API_KEY")
 
-    def get_enterprise_list(self,enterprise_list=None):
+    def _enterprise_list_query(self,enterprise_list=None):
     # with open("data.json", "r") as f:
     #     enterprises = json.load(f)
         
@@ -40,35 +40,9 @@ class api_calls:
         }}
         }}
         """
+        return query
 
-        headers = {
-            "X-API-Key": self.api_key,
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-            "Connection": "keep-alive",
-            "Origin": "https://dam-uat.riverstonetech.com",
-            "Accept-Encoding": "gzip, deflate, br"
-        }
-
-        try:
-            response = requests.post(
-                self.url,
-                headers=headers,
-                json={"query": query.strip()}
-            )
-            data = response.json()
-
-            if "errors" in data:
-                return {"error": data["errors"]}
-
-            # Return entire JSON structure exactly as received
-            return data
-
-        except Exception as e:
-            return {"error": str(e)}
-        
-    def get_enterprise_price_list(self,enterprise_list=[]):
-
+    def _price_list_query(self,enterprise_list=[]):
         if enterprise_list:
             inner = ','.join([f'{{ \\\"code\\\": \\\"{ent}\\\" }}' for ent in enterprise_list])
 
@@ -169,23 +143,9 @@ class api_calls:
         }}
         }}
         """
+        return query
 
-        headers = {
-            "X-API-Key": self.api_key,
-            "Content-Type": "application/json",
-            "Accept": "application/json"
-        }
-        try:
-            response = requests.post(self.price_list_url, headers=headers, json={"query": query})
-            response.raise_for_status()
-            data = response.json()
-
-            return data
-        
-        except Exception as e:
-            print("❌ Error in check_product_availability:", str(e))
-            return {}
-    def get_enterprise_cutsheet(self,enterprise_list=[]):
+    def _cutsheet_query(self,enterprise_list=[]):
         if enterprise_list:
             inner = ','.join([f'{{ \\\"code\\\": \\\"{ent}\\\" }}' for ent in enterprise_list])
 
@@ -230,19 +190,50 @@ class api_calls:
 }}
 
         """
+        return query
 
-        headers = {
+    def _headers(self):
+        return {
             "X-API-Key": self.api_key,
             "Content-Type": "application/json",
-            "Accept": "application/json"
+            "Accept": "application/json",
         }
+
+    def get_enterprise_list(self,enterprise_list=None):
+        headers = {**self._headers(), "Origin": "https://dam-uat.riverstonetech.com"}
         try:
-            response = requests.post(self.price_list_url, headers=headers, json={"query": query})
+            response = post_json(self.url, {"query": self._enterprise_list_query(enterprise_list).strip()}, headers)
+            data = response.json()
+
+            if "errors" in data:
+                return {"error": data["errors"]}
+
+            # Return entire JSON structure exactly as received
+            return data
+
+        except Exception as e:
+            return {"error": str(e)}
+        
+    def get_enterprise_price_list(self,enterprise_list=[]):
+        try:
+            response = post_json(self.price_list_url, {"query": self._price_list_query(enterprise_list)}, self._headers())
+            response.raise_for_status()
+            data = response.json()
+
+            return data
+        
+        except Exception as e:
+            print("❌ Error in check_product_availability:", str(e), file=sys.stderr)
+            return {}
+
+    def get_enterprise_cutsheet(self,enterprise_list=[]):
+        try:
+            response = post_json(self.price_list_url, {"query": self._cutsheet_query(enterprise_list)}, self._headers())
             response.raise_for_status()
             data = response.json()
 
             return data
         
         except Exception as e:
-            print("❌ Error in check_product_availability:", str(e))
-            return {}
\ No newline at end of file
+            print("❌ Error in check_product_availability:", str(e), file=sys.stderr)
+            return {}
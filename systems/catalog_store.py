@@ -0,0 +1,244 @@
+from dotenv import load_dotenv
+import threading
+from contextlib import contextmanager
+import hashlib
+import sqlite3
+import json
+import time
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+from systems.api_calls import api_calls
+
+# -------------------------
+# Catalog snapshot store
+# -------------------------
+# Local SQLite copy of the enterprise price list. Every enterprise is stored as
+# its own snapshot (the node JSON exactly as the API returned it, plus a
+# normalized products / features / options view of it) with a version (hash of
+# the node) and the time it was last synced.
+#
+# get_enterprise_price_list returns the same nested shape as the API. Only the
+# enterprises that are missing or older than CATALOG_TTL_SECONDS are fetched,
+# in one request; if the API is unreachable the last snapshot is served.
+
+CATALOG_DB = os.getenv(
+    "CATALOG_DB",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "catalog_snapshot.db"),
+)
+CATALOG_TTL_SECONDS = int(os.getenv("CATALOG_TTL_SECONDS", "3600"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS enterprises (
+    code TEXT PRIMARY KEY,
+    name TEXT,
+    description TEXT,
+    version TEXT NOT NULL,
+    synced_at REAL NOT NULL,
+    node TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS products (
+    enterprise TEXT NOT NULL,
+    code TEXT NOT NULL,
+    description TEXT,
+    category TEXT,
+    base_price REAL,
+    currency TEXT,
+    PRIMARY KEY (enterprise, code)
+);
+CREATE TABLE IF NOT EXISTS features (
+    enterprise TEXT NOT NULL,
+    product_code TEXT NOT NULL,
+    code TEXT,
+    description TEXT
+);
+CREATE TABLE IF NOT EXISTS options (
+    enterprise TEXT NOT NULL,
+    product_code TEXT NOT NULL,
+    feature_code TEXT,
+    code TEXT,
+    description TEXT,
+    upcharge REAL,
+    currency TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_features_product ON features (enterprise, product_code);
+CREATE INDEX IF NOT EXISTS idx_options_product ON options (enterprise, product_code);
+"""
+
+
+def _first_price(prices):
+    """(price, currency code) of the first entry of a BasePrice / UpCharge list."""
+    for entry in prices or []:
+        price = entry.get("price")
+        currency = None
+        for price_list in entry.get("PriceList") or []:
+            for zone in price_list.get("PriceZone") or []:
+                for cur in zone.get("Currency") or []:
+                    currency = currency or cur.get("Code")
+        try:
+            return float(price), currency
+        except (TypeError, ValueError):
+            return None, currency
+    return None, None
+
+
+def _iter_products(node):
+    for child in node.get("children") or []:
+        for folder in child.get("children") or []:
+            if folder.get("key") == "Product":
+                for prod in folder.get("children") or []:
+                    if prod.get("code"):
+                        yield prod
+
+
+def _version(node):
+    return hashlib.sha256(json.dumps(node, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class catalog_store:
+    _write_lock = threading.Lock()
+
+    def __init__(self, db_path=CATALOG_DB, ttl=CATALOG_TTL_SECONDS, api=None):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.api = api or api_calls()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with conn:  # commit on success, roll back on error
+                yield conn
+        finally:
+            conn.close()
+
+    # -------------------------
+    # Reads
+    # -------------------------
+    def get_enterprise_price_list(self, enterprise_list=[]):
+        """
+        Drop-in for api_calls.get_enterprise_price_list, served from the
+        snapshot after syncing the requested enterprises that are stale.
+        """
+        codes = self.sync(enterprise_list)
+        with self._connect() as conn:
+            rows = dict(conn.execute(
+                f"SELECT code, node FROM enterprises WHERE code IN ({','.join('?' * len(codes))})", codes
+            ).fetchall()) if codes else {}
+
+        edges = [{"node": json.loads(rows[code])} for code in codes if code in rows]
+        if not edges:
+            return {}
+        return {"data": {"getEnterpriseListing": {"edges": edges}}}
+
+    def versions(self, enterprise_list=None):
+        """{enterprise: (version, synced_at)} for the stored enterprises."""
+        query = "SELECT code, version, synced_at FROM enterprises"
+        params = []
+        if enterprise_list:
+            query += f" WHERE code IN ({','.join('?' * len(enterprise_list))})"
+            params = list(enterprise_list)
+        with self._connect() as conn:
+            return {code: (version, synced_at) for code, version, synced_at in conn.execute(query, params)}
+
+    def get_products(self, enterprise):
+        """Normalized product rows of one enterprise, without triggering a sync."""
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(r) for r in conn.execute(
+                "SELECT code, description, category, base_price, currency FROM products WHERE enterprise = ?",
+                (enterprise,),
+            )]
+
+    def get_options(self, enterprise, product_code):
+        with self._connect() as conn:
+            conn.row_factory = sqlite3.Row
+            return [dict(r) for r in conn.execute(
+                "SELECT feature_code, code, description, upcharge, currency FROM options "
+                "WHERE enterprise = ? AND product_code = ?",
+                (enterprise, product_code),
+            )]
+
+    # -------------------------
+    # Sync
+    # -------------------------
+    def _all_enterprise_codes(self):
+        data = self.api.get_enterprise_list()
+        edges = (data.get("data") or {}).get("getEnterpriseListing", {}).get("edges", []) if isinstance(data, dict) else []
+        codes = [e["node"]["code"] for e in edges if e.get("node", {}).get("code")]
+        if codes:
+            return codes
+        # API unreachable: fall back to whatever has been synced before
+        return list(self.versions())
+
+    def sync(self, enterprise_list=None, force=False):
+        """
+        Refresh the requested enterprises (all if empty) that are missing or
+        older than the TTL, in one price-list request. Returns the codes asked for.
+        """
+        codes = list(dict.fromkeys(enterprise_list)) if enterprise_list else self._all_enterprise_codes()
+        now = time.time()
+        known = self.versions(codes)
+        stale = [c for c in codes if force or c not in known or now - known[c][1] > self.ttl]
+        if not stale:
+            return codes
+
+        data = self.api.get_enterprise_price_list(stale)
+        edges = (data.get("data") or {}).get("getEnterpriseListing", {}).get("edges", []) if isinstance(data, dict) else []
+        if not edges:
+            print(f"❌ Catalog sync failed for {', '.join(stale)}; serving last snapshot.", file=sys.stderr)
+            return codes
+
+        changed = 0
+        with self._write_lock, self._connect() as conn:
+            for edge in edges:
+                node = edge.get("node") or {}
+                code = node.get("code")
+                if not code:
+                    continue
+                version = _version(node)
+                if code in known and known[code][0] == version:
+                    conn.execute("UPDATE enterprises SET synced_at = ? WHERE code = ?", (now, code))
+                    continue
+                self._replace(conn, code, node, version, now)
+                changed += 1
+        print(f"✅ Catalog synced: {len(stale)} checked, {changed} updated.", file=sys.stderr)
+        return codes
+
+    def _replace(self, conn, code, node, version, synced_at):
+        conn.execute(
+            "INSERT OR REPLACE INTO enterprises (code, name, description, version, synced_at, node) VALUES (?, ?, ?, ?, ?, ?)",
+            (code, node.get("name"), node.get("description"), version, synced_at, json.dumps(node)),
+        )
+        for table in ("products", "features", "options"):
+            conn.execute(f"DELETE FROM {table} WHERE enterprise = ?", (code,))
+
+        products, features, options = {}, [], []
+        for prod in _iter_products(node):
+            price, currency = _first_price(prod.get("BasePrice"))
+            category = (prod.get("productCategory") or [{}])[0].get("productCategory")
+            products[prod["code"]] = (code, prod["code"], prod.get("description"), category, price, currency)
+            for feature in prod.get("Feature") or []:
+                features.append((code, prod["code"], feature.get("code"), feature.get("description")))
+                for option in feature.get("Option") or []:
+                    upcharge, up_currency = _first_price(option.get("UpCharge"))
+                    options.append((code, prod["code"], feature.get("code"), option.get("Code"),
+                                    option.get("Description"), upcharge, up_currency))
+
+        conn.executemany("INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?, ?)", products.values())
+        conn.executemany("INSERT INTO features VALUES (?, ?, ?, ?)", features)
+        conn.executemany("INSERT INTO options VALUES (?, ?, ?, ?, ?, ?, ?)", options)
+
+
+if __name__ == "__main__":
+    # python systems/catalog_store.py [ENT ...]  -> force a refresh and print versions
+    store = catalog_store()
+    store.sync(sys.argv[1:], force=True)
+    for code, (version, synced_at) in store.versions(sys.argv[1:] or None).items():
+        print(f"{code}: {version[:12]} synced {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(synced_at))}")
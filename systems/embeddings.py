@@ -0,0 +1,281 @@
+import os
+import sys
+import time
+import threading
+import json
+import numpy as np
+from dotenv import load_dotenv
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:  # matching-only installs do not need LangChain
+    Embeddings = object
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.shared_files import atomic_write_json
+
+# -------------------------
+# Embedding backends
+# -------------------------
+# EMBEDDING_BACKEND selects how all-MiniLM-L6-v2 is run, for both product
+# matching and RFP chunking:
+#   torch      SentenceTransformer on PyTorch (default)
+#   onnx       ONNX Runtime on the exported fp32 graph, no torch import
+#   onnx-int8  ONNX Runtime on a dynamically int8-quantized graph
+# All backends return float32 sentence vectors, mean-pooled and L2-normalised,
+# matching SentenceTransformer's output for this model.
+#
+# The int8 graph is checked against the fp32 graph on SAMPLE_TEXTS the first
+# time it is loaded (the result is kept next to it, in model_int8.onnx.json);
+# load_backend refuses it if any sample's cosine to fp32 is below MIN_COSINE.
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "all-MiniLM-L6-v2")
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch")
+ONNX_CACHE_DIR = os.getenv(
+    "EMBEDDING_ONNX_CACHE",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "onnx_models"),
+)
+MAX_SEQ_LENGTH = 256
+MIN_COSINE = float(os.getenv("EMBEDDING_MIN_COSINE", "0.99"))
+
+SAMPLE_TEXTS = [
+    "Conference Table 30d x 60w x 29h",
+    "Nesting Chairs Black",
+    "Lateral File 5 Drawer, 36\"",
+    "Mobile Pedestal Silver with Black Cushion",
+    "Sofa for Reception 2-Seater",
+    "Power workstations 30x72",
+]
+
+
+def embedding_model_id(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    """Identifier of the vectors a backend produces, used to key embedding caches."""
+    return model_name if backend == "torch" else f"{model_name}:{backend}"
+
+
+class TorchBackend:
+    def __init__(self, model_name=EMBEDDING_MODEL):
+        os.environ["USE_TF"] = "0"
+        from sentence_transformers import SentenceTransformer
+        self.model_name = model_name
+        self.model_id = embedding_model_id("torch", model_name)
+        self.model = SentenceTransformer(model_name, device="cpu")
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        return np.asarray(
+            self.model.encode(
+                list(texts),
+                batch_size=batch_size,
+                show_progress_bar=show_progress_bar,
+                device="cpu",
+                convert_to_numpy=True,
+            ),
+            dtype=np.float32,
+        )
+
+
+class OnnxBackend:
+    def __init__(self, model_name=EMBEDDING_MODEL, quantized=False):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        self.model_name = model_name
+        self.model_id = embedding_model_id("onnx-int8" if quantized else "onnx", model_name)
+        model_path, tokenizer_path = self._fetch(model_name, quantized)
+        self.model_path = model_path
+
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding()
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    @staticmethod
+    def _fetch(model_name, quantized):
+        """Download the exported ONNX graph and tokenizer once; quantize locally if asked."""
+        from huggingface_hub import hf_hub_download
+
+        repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+        target_dir = os.path.join(ONNX_CACHE_DIR, repo.replace("/", "__"))
+        os.makedirs(target_dir, exist_ok=True)
+
+        tokenizer_path = hf_hub_download(repo, "tokenizer.json", local_dir=target_dir)
+        model_path = hf_hub_download(repo, "onnx/model.onnx", local_dir=target_dir)
+        if not quantized:
+            return model_path, tokenizer_path
+
+        int8_path = os.path.join(target_dir, "onnx", "model_int8.onnx")
+        if not os.path.exists(int8_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+            tmp_path = int8_path + ".tmp"
+            if os.path.exists(int8_path + ".json"):
+                os.remove(int8_path + ".json")  # tolerance check of a previous graph
+            quantize_dynamic(model_path, tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, int8_path)
+        return int8_path, tokenizer_path
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        texts = list(texts)
+        out = np.zeros((len(texts), 0), dtype=np.float32)
+        # Sort by length so each batch pads to similar lengths
+        order = np.argsort([len(t) for t in texts], kind="stable")
+        chunks = []
+        for start in range(0, len(texts), batch_size):
+            batch = [texts[i] for i in order[start:start + batch_size]]
+            enc = self.tokenizer.encode_batch(batch)
+            ids = np.array([e.ids for e in enc], dtype=np.int64)
+            mask = np.array([e.attention_mask for e in enc], dtype=np.int64)
+            feeds = {"input_ids": ids, "attention_mask": mask}
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in enc], dtype=np.int64)
+            hidden = self.session.run(None, feeds)[0]
+
+            # Mean pooling over real tokens, then L2 normalisation
+            weights = mask[:, :, None].astype(np.float32)
+            pooled = (hidden * weights).sum(axis=1) / np.clip(weights.sum(axis=1), 1e-9, None)
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+            chunks.append(pooled.astype(np.float32))
+
+        if chunks:
+            out = np.empty((len(texts), chunks[0].shape[1]), dtype=np.float32)
+            out[order] = np.vstack(chunks)
+        return out
+
+
+def min_cosine(ref, cand):
+    """Lowest row-wise cosine between two (n, dim) matrices."""
+    cosines = (ref * cand).sum(axis=1) / (
+        np.linalg.norm(ref, axis=1) * np.linalg.norm(cand, axis=1) + 1e-8
+    )
+    return float(cosines.min())
+
+
+def _check_quantized(backend, model_name):
+    """Refuse an int8 graph whose vectors drift from the fp32 graph's by more than MIN_COSINE."""
+    check_path = backend.model_path + ".json"
+    try:
+        with open(check_path, "r") as f:
+            measured = json.load(f)["min_cosine"]
+    except (FileNotFoundError, ValueError, KeyError):
+        reference = OnnxBackend(model_name).encode(SAMPLE_TEXTS)
+        measured = min_cosine(reference, backend.encode(SAMPLE_TEXTS))
+        atomic_write_json(check_path, {"reference": "onnx", "min_cosine": measured})
+    if measured < MIN_COSINE:
+        raise ValueError(
+            f"❌ {backend.model_id} is out of tolerance: min cosine to fp32 {measured:.5f} < {MIN_COSINE}. "
+            "Use EMBEDDING_BACKEND=onnx or torch."
+        )
+
+
+def load_backend(backend=EMBEDDING_BACKEND, model_name=EMBEDDING_MODEL):
+    if backend == "torch":
+        return TorchBackend(model_name)
+    if backend == "onnx":
+        return OnnxBackend(model_name)
+    if backend == "onnx-int8":
+        loaded = OnnxBackend(model_name, quantized=True)
+        _check_quantized(loaded, model_name)
+        return loaded
+    raise ValueError(f"❌ Unknown EMBEDDING_BACKEND: {backend}")
+
+
+# -------------------------
+# Shared embedder
+# -------------------------
+# One model per process, loaded on first use. Product matching (finder,
+# indexer) and RFP chunking (BackendEmbeddings) all go through get_embedder,
+# so the weights are read from disk once. The load is guarded by a lock, so
+# threads asking at the same time wait for a single load instead of each
+# loading a copy. Load time and encode throughput are kept in embedding_stats().
+
+class SharedEmbedder:
+    """Backend wrapper that counts encode calls, texts and time."""
+
+    def __init__(self, backend, load_seconds):
+        self.backend = backend
+        self.model_name = backend.model_name
+        self.model_id = backend.model_id
+        self.load_seconds = load_seconds
+        self.batches = 0
+        self.texts = 0
+        self.encode_seconds = 0.0
+        self._stats_lock = threading.Lock()
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, **kwargs):
+        texts = list(texts)
+        start = time.perf_counter()
+        vectors = self.backend.encode(texts, batch_size=batch_size, show_progress_bar=show_progress_bar, **kwargs)
+        elapsed = time.perf_counter() - start
+        with self._stats_lock:
+            self.batches += 1
+            self.texts += len(texts)
+            self.encode_seconds += elapsed
+        return vectors
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "model_id": self.model_id,
+                "load_seconds": round(self.load_seconds, 3),
+                "encode_calls": self.batches,
+                "texts": self.texts,
+                "encode_seconds": round(self.encode_seconds, 3),
+                "texts_per_second": round(self.texts / self.encode_seconds, 1) if self.encode_seconds else None,
+            }
+
+
+_embedder = None  # will initialize only on first encode
+_embedder_lock = threading.Lock()
+
+
+def get_embedder() -> SharedEmbedder:
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                start = time.perf_counter()
+                backend = load_backend()
+                load_seconds = time.perf_counter() - start
+                print(f"✅ Embedding model {backend.model_id} loaded in {load_seconds:.2f} s", file=sys.stderr)
+                _embedder = SharedEmbedder(backend, load_seconds)
+    return _embedder
+
+
+def embedding_stats():
+    """Load time and encode throughput of this process's embedder (None before it is loaded)."""
+    return _embedder.stats() if _embedder is not None else None
+
+
+class BackendEmbeddings(Embeddings):
+    """LangChain Embeddings adapter over the shared embedder."""
+
+    def __init__(self, embedder=None):
+        self.embedder = embedder
+
+    def _encoder(self):
+        return self.embedder or get_embedder()
+
+    def embed_documents(self, texts):
+        return self._encoder().encode(texts).tolist()
+
+    def embed_query(self, text):
+        return self._encoder().encode([text])[0].tolist()
+
+
+def compare_backends(texts, reference="torch", candidate="onnx-int8", model_name=EMBEDDING_MODEL):
+    """Return (max abs difference, min cosine) between two backends' vectors for `texts`."""
+    ref = load_backend(reference, model_name).encode(texts)
+    cand = load_backend(candidate, model_name).encode(texts)
+    return float(np.abs(ref - cand).max()), min_cosine(ref, cand)
+
+
+if __name__ == "__main__":
+    candidate = sys.argv[1] if len(sys.argv) > 1 else "onnx-int8"
+    max_diff, min_cos = compare_backends(SAMPLE_TEXTS, candidate=candidate)
+    verdict = "✅ within" if min_cos >= MIN_COSINE else "❌ outside"
+    print(f"torch vs {candidate}: max |diff| = {max_diff:.5f}, min cosine = {min_cos:.5f} ({verdict} {MIN_COSINE})")
@@ -0,0 +1,163 @@
+from dotenv import load_dotenv
+import mimetypes
+import hashlib
+import base64
+import json
+import sys
+import re
+import os
+from urllib.parse import urljoin, urlsplit
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.shared_files import atomic_write_bytes, atomic_write_json
+
+# -------------------------
+# Self-contained HTML for PDF rendering
+# -------------------------
+# A document without external resources is fully loaded once its "load" event
+# fires, so it can skip the networkidle wait (500 ms with no requests).
+# inline_assets swaps every external resource a page would load (img/script/
+# stylesheet/source src, srcset, CSS url() and @import) for a data: URI. The
+# bytes come from a local asset cache, so each URL is downloaded once.
+# A stylesheet's own url() and @import references are resolved against the
+# stylesheet URL and inlined the same way before the stylesheet itself is.
+# Links (<a href>) are not resources and are left alone.
+
+ASSET_CACHE_DIR = os.getenv(
+    "ASSET_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "asset_cache"),
+)
+
+_TAG_ATTR = re.compile(
+    r"""<(?P<tag>img|script|source|iframe|embed|video|audio|input|link)\b[^>]*?\s(?P<attr>src|href|poster)\s*=\s*(?P<q>["'])(?P<url>.*?)(?P=q)""",
+    re.IGNORECASE | re.DOTALL,
+)
+_SRCSET = re.compile(r"""\ssrcset\s*=\s*(?P<q>["'])(?P<value>.*?)(?P=q)""", re.IGNORECASE | re.DOTALL)
+_CSS_URL = re.compile(r"""url\(\s*(?P<q>["']?)(?P<url>[^"')]+?)(?P=q)\s*\)""", re.IGNORECASE)
+_CSS_IMPORT = re.compile(r"""@import\s+(?P<q>["'])(?P<url>.*?)(?P=q)""", re.IGNORECASE)
+_LINK_REL = re.compile(r"""\srel\s*=\s*["']?([^"'>]+)""", re.IGNORECASE)
+
+
+def _is_external(url):
+    return bool(re.match(r"^\s*(https?:)?//", url, re.IGNORECASE))
+
+
+def _resource_urls(html):
+    """Yield (match span, url) for every resource reference in `html`."""
+    for m in _TAG_ATTR.finditer(html):
+        if m.group("tag").lower() == "link":
+            # only <link>s the browser fetches; rel=canonical etc. are not loaded
+            rel = _LINK_REL.search(html[m.start():html.find(">", m.end()) + 1])
+            if not rel or not re.search(r"stylesheet|icon|preload", rel.group(1), re.IGNORECASE):
+                continue
+        yield m.span("url"), m.group("url")
+    for m in _SRCSET.finditer(html):
+        offset = m.start("value")
+        for candidate in re.finditer(r"[^\s,][^\s,]*", m.group("value")):
+            url = candidate.group(0)
+            if not re.match(r"^\d+(\.\d+)?[wx]$", url):
+                yield (offset + candidate.start(), offset + candidate.end()), url
+    for pattern in (_CSS_URL, _CSS_IMPORT):
+        for m in pattern.finditer(html):
+            yield m.span("url"), m.group("url")
+
+
+def find_external_resources(html):
+    """URLs of the resources `html` would fetch over the network when rendered."""
+    return sorted({url.strip() for _, url in _resource_urls(html) if _is_external(url)})
+
+
+def _cache_paths(url):
+    name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return os.path.join(ASSET_CACHE_DIR, name), os.path.join(ASSET_CACHE_DIR, name + ".json")
+
+
+def fetch_asset(url):
+    """Return (bytes, mime type) for `url`, from the asset cache or downloaded into it."""
+    data_path, meta_path = _cache_paths(url)
+    if os.path.exists(data_path) and os.path.exists(meta_path):
+        with open(meta_path, "r") as f:
+            mime_type = json.load(f)["mime_type"]
+        with open(data_path, "rb") as f:
+            return f.read(), mime_type
+
+    from systems.http_client import get
+    response = get("https:" + url if url.startswith("//") else url)
+    response.raise_for_status()
+    mime_type = (response.headers.get("Content-Type") or "").split(";")[0].strip()
+    if not mime_type:
+        mime_type = mimetypes.guess_type(url)[0] or "application/octet-stream"
+
+    os.makedirs(ASSET_CACHE_DIR, exist_ok=True)
+    # Bytes first: an entry counts as cached only once its meta file exists
+    atomic_write_bytes(data_path, response.content)
+    atomic_write_json(meta_path, {"url": url, "mime_type": mime_type})
+    return response.content, mime_type
+
+
+def fetch_data_uri(url):
+    content, mime_type = fetch_asset(url)
+    return f"data:{mime_type};base64,{base64.b64encode(content).decode('utf-8')}"
+
+
+def _is_stylesheet(url, mime_type):
+    return mime_type == "text/css" or urlsplit(url).path.lower().endswith(".css")
+
+
+def _inline(url, remaining, seen):
+    """data: URI for `url`; a stylesheet gets its own references inlined first."""
+    content, mime_type = fetch_asset(url)
+    if _is_stylesheet(url, mime_type):
+        css = _inline_css(content.decode("utf-8", errors="replace"), url, remaining, seen | {url})
+        content, mime_type = css.encode("utf-8"), "text/css"
+    return f"data:{mime_type};base64,{base64.b64encode(content).decode('utf-8')}"
+
+
+def _inline_css(css, base_url, remaining, seen):
+    """Replace the url() and @import references of a stylesheet fetched from `base_url`."""
+    spans = sorted({m.span("url"): m.group("url") for p in (_CSS_URL, _CSS_IMPORT) for m in p.finditer(css)}.items())
+    parts, last = [], 0
+    for (start, end), ref in spans:
+        ref = ref.strip()
+        if start < last or ref.lower().startswith(("data:", "#")):
+            continue
+        url = urljoin(base_url, ref)
+        try:
+            if url in seen:
+                raise ValueError("circular @import")
+            replacement = _inline(url, remaining, seen)
+        except Exception as e:
+            print(f"❌ Could not inline {url}: {e}", file=sys.stderr)
+            remaining.add(url)
+            continue
+        parts.append(css[last:start])
+        parts.append(replacement)
+        last = end
+    parts.append(css[last:])
+    return "".join(parts)
+
+
+def inline_assets(html):
+    """
+    Return (html, remaining) where every external resource that could be
+    fetched is replaced by a data: URI and `remaining` lists those that could
+    not, including references inside inlined stylesheets.
+    """
+    spans = sorted({span: url for span, url in _resource_urls(html) if _is_external(url)}.items())
+    parts, last, remaining = [], 0, set()
+    for (start, end), url in spans:
+        if start < last:
+            continue  # overlapping match (e.g. url() inside an already replaced attribute)
+        try:
+            replacement = _inline(url.strip(), remaining, frozenset())
+        except Exception as e:
+            print(f"❌ Could not inline {url}: {e}", file=sys.stderr)
+            remaining.add(url.strip())
+            continue
+        parts.append(html[last:start])
+        parts.append(replacement)
+        last = end
+    parts.append(html[last:])
+    return "".join(parts), sorted(remaining)
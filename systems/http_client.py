@@ -0,0 +1,84 @@
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import threading
+import requests
+import os
+
+load_dotenv(dotenv_path=os.path.join(os.path.dirname(__file__), "..", ".env"))
+
+# -------------------------
+# Shared HTTP client
+# -------------------------
+# One pooled, keep-alive session per process for all GraphQL calls, so repeat
+# calls reuse the TCP+TLS connection instead of handshaking every time.
+#   - timeouts on connect and read
+#   - retry with exponential backoff (and Retry-After) on 429 / 5xx and on
+#     connection errors; GraphQL queries are reads, so POSTs are retried too
+#   - at most HTTP_MAX_CONCURRENCY requests in flight per process
+#   - gzip, and brotli when the brotli package is installed
+
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "120"))
+HTTP_RETRIES = int(os.getenv("HTTP_RETRIES", "3"))
+HTTP_BACKOFF = float(os.getenv("HTTP_BACKOFF", "0.5"))
+HTTP_MAX_CONCURRENCY = int(os.getenv("HTTP_MAX_CONCURRENCY", "8"))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+try:
+    import brotli  # noqa: F401  (lets urllib3 decode "br")
+    ACCEPT_ENCODING = "gzip, deflate, br"
+except ImportError:
+    ACCEPT_ENCODING = "gzip, deflate"
+
+_session = None
+_session_lock = threading.Lock()
+_in_flight = threading.BoundedSemaphore(HTTP_MAX_CONCURRENCY)
+
+
+def get_session():
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                retry = Retry(
+                    total=HTTP_RETRIES,
+                    backoff_factor=HTTP_BACKOFF,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=None,
+                    respect_retry_after_header=True,
+                    raise_on_status=False,
+                )
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_MAX_CONCURRENCY,
+                    pool_maxsize=HTTP_MAX_CONCURRENCY,
+                    max_retries=retry,
+                )
+                session = requests.Session()
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update({"Accept-Encoding": ACCEPT_ENCODING})
+                _session = session
+    return _session
+
+
+def post_json(url, payload, headers=None, timeout=None):
+    """POST a JSON payload through the shared session and return the response."""
+    with _in_flight:
+        return get_session().post(
+            url,
+            json=payload,
+            headers=headers,
+            timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        )
+
+
+def get(url, headers=None, timeout=None):
+    """GET through the shared session and return the response."""
+    with _in_flight:
+        return get_session().get(
+            url,
+            headers=headers,
+            timeout=timeout or (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT),
+        )
+
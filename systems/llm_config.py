@@ -1,7 +1,14 @@
 import os
+import hashlib
+import threading
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from openai import OpenAI
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from systems.embeddings import BackendEmbeddings, embedding_model_id
+from systems.shared_files import file_lock
 
 
 # Disable Chroma telemetry
@@ -22,28 +29,94 @@ llm = ChatOpenAI(
     openai_api_key=api_key
 )
 
-def chunking(text: str):
-    from langchain_huggingface import HuggingFaceEmbeddings
+# -------------------------
+# RFP chunk store
+# -------------------------
+# Chunk embeddings of an RFP are kept in a persistent Chroma store under
+# CHROMA_DIR, one collection per (rfp_id, source) - e.g. the PDF text for
+# summarization and the summary for matching - so the same text is embedded
+# once and reused by later calls, other tool processes and after a restart.
+# A collection records the hash of its text, the embedding model and the
+# chunking settings, and is rebuilt when any of them changes.
+# Without an rfp_id the chunks are embedded into a throwaway in-memory store.
+
+CHROMA_DIR = os.getenv(
+    "CHROMA_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "chroma_store"),
+)
+CHUNK_SIZE = 1200
+CHUNK_OVERLAP = 200  # Reduced overlap to minimize duplicate tokens
+
+_chroma_client = None
+_chroma_lock = threading.Lock()
+
+
+def get_chroma_client():
+    global _chroma_client
+    with _chroma_lock:
+        if _chroma_client is None:
+            import chromadb
+            from chromadb.config import Settings
+            os.makedirs(CHROMA_DIR, exist_ok=True)
+            _chroma_client = chromadb.PersistentClient(path=CHROMA_DIR, settings=Settings(anonymized_telemetry=False))
+    return _chroma_client
+
+
+def rfp_vector_store(text: str, rfp_id: str = None, source: str = "document"):
     from langchain.text_splitter import CharacterTextSplitter
-    from langchain.chains import RetrievalQA
     from langchain_community.vectorstores import Chroma
-    from langchain.schema import Document   
+    from langchain.schema import Document
 
     os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
-    langchain_embeddings = HuggingFaceEmbeddings(
-        model_name="all-MiniLM-L6-v2",
-        model_kwargs={"device": "cpu"}
-    )
-
-    # Reduced overlap to minimize duplicate tokens
-    splitter = CharacterTextSplitter(chunk_size=1200, chunk_overlap=200)
-
-    documents = [Document(page_content=text)]
-    docs = splitter.split_documents(documents)
+    # Same embedding backend (torch / onnx / onnx-int8) as product matching
+    langchain_embeddings = BackendEmbeddings()
+
+    def split():
+        splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+        return splitter.split_documents([Document(page_content=text)])
+
+    if not rfp_id:
+        return Chroma.from_documents(split(), langchain_embeddings)
+
+    client = get_chroma_client()
+    name = f"rfp-{rfp_id[:40]}-{source}"
+    metadata = {
+        "rfp_id": rfp_id,
+        "source": source,
+        "content_hash": hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        "embedding_model": embedding_model_id(),
+        "chunking": f"{CHUNK_SIZE}/{CHUNK_OVERLAP}",
+    }
+    # One builder per collection across processes; the others wait and reuse it
+    with file_lock(os.path.join(CHROMA_DIR, "locks", f"{name}.lock")):
+        try:
+            collection = client.get_collection(name)
+        except Exception:
+            collection = None
+        if collection is not None:
+            stored = collection.metadata or {}
+            if all(stored.get(k) == v for k, v in metadata.items()) and collection.count():
+                print(f"✅ Reusing {collection.count()} stored chunks for RFP {rfp_id[:12]} ({source})", file=sys.stderr)
+                return Chroma(client=client, collection_name=name, embedding_function=langchain_embeddings)
+            client.delete_collection(name)
+
+        docs = split()
+        return Chroma.from_documents(
+            docs,
+            langchain_embeddings,
+            ids=[f"{i}" for i in range(len(docs))],
+            client=client,
+            collection_name=name,
+            collection_metadata=metadata,
+        )
+
+
+def chunking(text: str, rfp_id: str = None, source: str = "document"):
+    from langchain.chains import RetrievalQA
 
     global vectordb, qa_chain
-    vectordb = Chroma.from_documents(docs, langchain_embeddings)
+    vectordb = rfp_vector_store(text, rfp_id, source)
 
     # Reduced retriever size
     retriever = vectordb.as_retriever(search_kwargs={"k": 3})
@@ -1,32 +1,249 @@
 import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+from collections import deque
 from pathlib import Path
 from playwright.async_api import async_playwright
 
 PROJECT_ROOT = Path(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(str(PROJECT_ROOT))
+from systems.html_assets import inline_assets
+from systems.shared_files import update_json
+
+# -------------------------
+# Browser pool
+# -------------------------
+# One headless Chromium per process (per event loop), with PDF_POOL_SIZE
+# reusable pages. A render waits for a free page, so at most PDF_POOL_SIZE
+# documents are printed at once and the rest queue up.
+# Before every render the pool checks that the browser is still connected and
+# that the page is still open. If the browser crashed, it is relaunched and the
+# render is retried once. After PDF_MAX_RENDERS renders the browser is
+# recycled, once the pages in use have been handed back.
+
+PDF_POOL_SIZE = int(os.getenv("PDF_POOL_SIZE", "4"))
+PDF_MAX_RENDERS = int(os.getenv("PDF_MAX_RENDERS", "200"))
+PDF_OPTIONS = {"format": "A4", "print_background": True}
+PDF_CACHE_VERSION = 1  # bump when a renderer change should invalidate cached PDFs
+PDF_TIMINGS = deque(maxlen=int(os.getenv("PDF_TIMINGS_KEPT", "100")))  # most recent renders
+
+
+class BrowserPool:
+    def __init__(self, size=PDF_POOL_SIZE, max_renders=PDF_MAX_RENDERS):
+        self.size = size
+        self.max_renders = max_renders
+        self.loop = asyncio.get_running_loop()
+        self.playwright = None
+        self.browser = None
+        self.renders = 0
+        self.restarts = 0
+        self._lock = asyncio.Lock()
+        self._recycling = False
+        # A slot is a page, or None until one is opened on the current browser
+        self._slots = asyncio.Queue()
+        for _ in range(size):
+            self._slots.put_nowait(None)
+
+    def healthy(self):
+        return self.browser is not None and self.browser.is_connected()
+
+    async def _browser(self):
+        async with self._lock:
+            if not self.healthy():
+                await self._close_browser()
+                if self.playwright is None:
+                    self.playwright = await async_playwright().start()
+                self.browser = await self.playwright.chromium.launch(headless=True)
+                self.restarts += 1
+            return self.browser
+
+    async def _close_browser(self):
+        browser, self.browser = self.browser, None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass  # already gone
+
+    async def _page(self, slot):
+        browser = await self._browser()
+        if slot is not None and not slot.is_closed() and slot.context.browser is browser:
+            return slot
+        context = await browser.new_context()
+        return await context.new_page()
+
+    async def render(self, html_content, output_path, wait_until="networkidle"):
+        """Print `html_content` to `output_path`; returns the time spent per step, in ms."""
+        timings = {}
+        start = time.perf_counter()
+        slot = await self._slots.get()
+        timings["queue_ms"] = (time.perf_counter() - start) * 1000
+        try:
+            for attempt in range(2):
+                try:
+                    step = time.perf_counter()
+                    slot = await self._page(slot)
+                    timings["page_ms"] = (time.perf_counter() - step) * 1000
+                    step = time.perf_counter()
+                    await slot.set_content(html_content, wait_until=wait_until)
+                    timings["content_ms"] = (time.perf_counter() - step) * 1000
+                    step = time.perf_counter()
+                    await slot.pdf(path=str(output_path), **PDF_OPTIONS)
+                    timings["pdf_ms"] = (time.perf_counter() - step) * 1000
+                    self.renders += 1
+                    return timings
+                except Exception:
+                    # Retry once on a fresh browser, but only if the browser went away
+                    if attempt or self.healthy():
+                        raise
+                    print("❌ PDF browser crashed. Restarting...", file=sys.stderr)
+                    slot = None
+        except Exception:
+            if slot is not None:
+                try:
+                    await slot.context.close()
+                except Exception:
+                    pass
+            slot = None
+            raise
+        finally:
+            self._slots.put_nowait(slot)
+            if self.renders >= self.max_renders and not self._recycling:
+                self._recycling = True
+                asyncio.ensure_future(self._recycle())
+
+    async def _recycle(self):
+        # Take every slot back so no render is running, then restart the browser
+        taken = [await self._slots.get() for _ in range(self.size)]
+        try:
+            async with self._lock:
+                await self._close_browser()
+                self.renders = 0
+        finally:
+            for _ in taken:
+                self._slots.put_nowait(None)
+            self._recycling = False
+
+    async def close(self):
+        async with self._lock:
+            await self._close_browser()
+            if self.playwright is not None:
+                await self.playwright.stop()
+                self.playwright = None
+
+
+_pool = None
+
+
+def get_browser_pool() -> BrowserPool:
+    """The browser pool of the running event loop (playwright objects are bound to one loop)."""
+    global _pool
+    if _pool is None or _pool.loop is not asyncio.get_running_loop():
+        _pool = BrowserPool()
+    return _pool
+
+
+# -------------------------
+# PDF artifact cache
+# -------------------------
+# Every PDF is stored once per RFP as quotation/<rfp_id>/.objects/<hash>.pdf,
+# the hash covering the HTML and the render options. The logical files
+# (BLD.pdf, BLD_ent.pdf, proposal.pdf) are hard links to those objects, and
+# manifest.json maps each logical name to its hash. Rendering an HTML whose
+# hash is already stored only re-points the link, and an unchanged document
+# is not touched at all.
+
+def pdf_cache_key(html_content: str) -> str:
+    payload = json.dumps({"version": PDF_CACHE_VERSION, "options": PDF_OPTIONS}, sort_keys=True)
+    return hashlib.sha256((payload + "\0" + html_content).encode("utf-8")).hexdigest()
+
+
+def _link(object_path: Path, output_path: Path):
+    """Atomically point `output_path` at `object_path` (hard link, or a copy where links are unsupported)."""
+    tmp_path = output_path.with_name(f".{output_path.name}.{os.getpid()}.tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+    try:
+        os.link(object_path, tmp_path)
+    except OSError:
+        shutil.copyfile(object_path, tmp_path)
+    os.replace(tmp_path, output_path)
+
+
+def _record(rfp_folder: Path, filename: str, key: str):
+    def update(manifest):
+        previous = manifest.get(filename, {}).get("hash")
+        manifest[filename] = {"hash": key, "updated": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        # Drop the previous object once no logical name refers to it any more;
+        # done under the manifest lock so a concurrent _record cannot re-point to it in between
+        if previous and previous != key and all(e.get("hash") != previous for e in manifest.values()):
+            (rfp_folder / ".objects" / f"{previous}.pdf").unlink(missing_ok=True)
+
+    update_json(str(rfp_folder / "manifest.json"), update)
+
 
 async def html_to_pdf(html_content: str, rfp_id: str, filename: str) -> str:
     """
-    Convert HTML content to PDF using Playwright and save it inside
-    project_root/quotation/<rfp_id>/ folder.
+    Convert HTML content to PDF using a pooled Playwright browser and save it
+    inside project_root/quotation/<rfp_id>/ folder.
+
+    External resources are inlined first; a self-contained document is
+    rendered as soon as it has loaded instead of waiting for networkidle.
+    HTML that was rendered before for this RFP is served from the PDF cache.
     """
     # Ensure quotation folder exists
     rfp_folder = PROJECT_ROOT / "quotation" / rfp_id
-    rfp_folder.mkdir(parents=True, exist_ok=True)
+    objects = rfp_folder / ".objects"
+    objects.mkdir(parents=True, exist_ok=True)
 
     output_path = rfp_folder / filename
+    start = time.perf_counter()
+    key = pdf_cache_key(html_content)
+    object_path = objects / f"{key}.pdf"
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        await page.set_content(html_content, wait_until="networkidle")
-        await page.pdf(
-            path=str(output_path),
-            format="A4",
-            print_background=True,
-        )
-        await browser.close()
+    if object_path.exists():
+        if not (output_path.exists() and os.path.samefile(output_path, object_path)):
+            _link(object_path, output_path)
+            _record(rfp_folder, filename, key)
+        timings = {"file": f"{rfp_id}/{filename}", "cached": True, "total_ms": (time.perf_counter() - start) * 1000}
+        PDF_TIMINGS.append(timings)
+        print(f" PDF {timings['file']}: cached ({key[:12]}), {timings['total_ms']:.0f} ms", file=sys.stderr)
         return str(output_path.resolve())
 
+    html_content, remaining = await asyncio.to_thread(inline_assets, html_content)
+    inline_ms = (time.perf_counter() - start) * 1000
+    wait_until = "networkidle" if remaining else "load"
+
+    # Render next to the object and move it into place, so a half-written PDF is never cached
+    tmp_path = objects / f".{key}.{os.getpid()}.{id(html_content)}.tmp"
+    try:
+        timings = await get_browser_pool().render(html_content, tmp_path, wait_until=wait_until)
+        os.replace(tmp_path, object_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    _link(object_path, output_path)
+    _record(rfp_folder, filename, key)
+
+    timings = {
+        "file": f"{rfp_id}/{filename}",
+        "cached": False,
+        "wait_until": wait_until,
+        "inline_ms": inline_ms,
+        **timings,
+        "total_ms": (time.perf_counter() - start) * 1000,
+    }
+    PDF_TIMINGS.append(timings)
+    print(
+        f" PDF {timings['file']} ({wait_until}): "
+        + ", ".join(f"{k[:-3]} {v:.0f} ms" for k, v in timings.items() if k.endswith("_ms")),
+        file=sys.stderr,
+    )
+    return str(output_path.resolve())
+
 
 def pdf_to_bytes(rfp_id: str, filename: str) -> bytes:
     """
@@ -0,0 +1,92 @@
+from contextlib import contextmanager
+import tempfile
+import json
+import os
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# -------------------------
+# Files shared between the MCP server processes
+# -------------------------
+# Every tool runs as its own process, so a plain read-modify-write of a shared
+# file can lose another process's update, and a crash in the middle of a write
+# leaves a truncated file.
+#   - file_lock: exclusive OS lock on a side file (blocks until it is free)
+#   - atomic_write_json / atomic_write_bytes / atomic_save_npy: write a temp
+#     file next to the target, fsync, rename (readers that mmapped the old
+#     file keep its inode)
+#   - update_json: both together, for read-modify-write of a JSON file
+
+
+@contextmanager
+def file_lock(lock_path):
+    os.makedirs(os.path.dirname(os.path.abspath(lock_path)), exist_ok=True)
+    with open(lock_path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue  # LK_LOCK gives up after ~10 s; keep waiting
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _atomic_write(path, mode, write):
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)  # mkstemp files are 0600; other processes may run as other users
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(path, data, indent=4):
+    """Replace `path` with `data` so readers see either the old or the new file, never half of one."""
+    _atomic_write(path, "w", lambda f: json.dump(data, f, indent=indent))
+
+
+def atomic_write_bytes(path, data):
+    _atomic_write(path, "wb", lambda f: f.write(data))
+
+
+def atomic_save_npy(path, array):
+    """np.save counterpart of atomic_write_json."""
+    _atomic_write(path, "wb", lambda f: np.save(f, array))
+
+
+def update_json(path, update):
+    """
+    Read-modify-write `path` under its lock: `update` gets the current dict
+    (empty if the file is missing or unreadable) and changes it in place.
+    """
+    with file_lock(path + ".lock"):
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            data = {}
+        update(data)
+        atomic_write_json(path, data)
+        return data
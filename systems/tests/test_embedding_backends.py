@@ -0,0 +1,45 @@
+import os
+import sys
+import json
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from systems import embeddings
+from systems.embeddings import MIN_COSINE, SAMPLE_TEXTS, load_backend, min_cosine
+
+
+@pytest.mark.parametrize("candidate", ["onnx", "onnx-int8"])
+def test_onnx_backends_within_tolerance_of_torch(candidate):
+    pytest.importorskip("torch")
+    pytest.importorskip("sentence_transformers")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    try:
+        reference = load_backend("torch")
+        backend = load_backend(candidate)
+    except OSError as e:
+        # weights are downloaded from the Hugging Face hub on first use
+        pytest.skip(f"model weights unavailable (offline?): {e}")
+    assert min_cosine(reference.encode(SAMPLE_TEXTS), backend.encode(SAMPLE_TEXTS)) >= MIN_COSINE
+
+
+class _Graph:
+    model_id = "all-MiniLM-L6-v2:onnx-int8"
+
+    def __init__(self, model_path):
+        self.model_path = model_path
+
+
+def test_out_of_tolerance_int8_graph_is_refused(tmp_path):
+    graph = _Graph(str(tmp_path / "model_int8.onnx"))
+    with open(graph.model_path + ".json", "w") as f:
+        json.dump({"reference": "onnx", "min_cosine": MIN_COSINE - 0.05}, f)
+    with pytest.raises(ValueError, match="out of tolerance"):
+        embeddings._check_quantized(graph, "all-MiniLM-L6-v2")
+
+
+def test_recorded_int8_check_within_tolerance_is_accepted(tmp_path):
+    graph = _Graph(str(tmp_path / "model_int8.onnx"))
+    with open(graph.model_path + ".json", "w") as f:
+        json.dump({"reference": "onnx", "min_cosine": 0.999}, f)
+    embeddings._check_quantized(graph, "all-MiniLM-L6-v2")
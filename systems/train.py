@@ -8,11 +8,13 @@ import os
 # Add the directory containing this file to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from api_calls import api_calls
+from catalog_store import catalog_store
 
 
 class train_data:
     def __init__(self):
         self.api=api_calls()
+        self.catalog=catalog_store(api=self.api)
     # === Clean text function ===
     def clean_description(self,text: str) -> str:
         text = text.lower()
@@ -30,7 +32,7 @@ class train_data:
         products_by_enterprise = {}
 
         # Loop through each enterprise and fetch its products
-        data = self.api.get_enterprise_price_list(enterprise_list)
+        data = self.catalog.get_enterprise_price_list(enterprise_list)
 
         for edge in data.get("data", {}).get("getEnterpriseListing", {}).get("edges", []):
             enterprise_code = edge.get("node", {}).get("code", "UNKNOWN")
@@ -1,6 +1,3 @@
-import base64
-import requests
-import mimetypes
 import json
 from jinja2 import Template
 from datetime import datetime, date
@@ -370,19 +367,10 @@ def render_quotation(progress: dict,today) -> str:
 
 def image_url_to_base64(url: str) -> str:
     """
-    Downloads an image from a URL and returns a Base64 data URI.
+    Downloads an image from a URL (once, via the local asset cache) and returns a Base64 data URI.
     """
-    response = requests.get(url)
-    response.raise_for_status()
-
-    mime_type = response.headers.get("Content-Type")
-    if not mime_type:
-        mime_type, _ = mimetypes.guess_type(url)
-        if not mime_type:
-            mime_type = "image/jpeg"
-
-    encoded = base64.b64encode(response.content).decode("utf-8")
-    return f"data:{mime_type};base64,{encoded}"
+    from systems.html_assets import fetch_data_uri
+    return fetch_data_uri(url)
 
 def render_cutsheet(data: dict) -> str:
     """